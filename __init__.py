@@ -1,3 +1,6 @@
 from .vector import Vector
 from .scalarField import ScalarField
 from .vectorField import VectorField
+from .vectorArray import VectorArray
+from .pipeline import Pipeline
+from .sparseField import SparseField
@@ -0,0 +1,291 @@
+# benchmark harness for field construction, operators and rendering,
+# sweeps grid sizes, records the best wall time and the tracemalloc peak
+# of each case and compares them against a stored baseline
+# run from the directory containing the package:
+#   python -m vector_calculus.benchmarks.run --out results.json
+#   python -m vector_calculus.benchmarks.run --baseline results.json
+# the exit status is 1 when a case got slower or bigger than the
+# thresholds allow
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+from ..vector import Vector
+from ..scalarField import ScalarField
+from ..vectorField import VectorField
+from .. import rendering
+
+
+SIZES = (
+    (32, 32), (64, 64), (128, 128), (256, 256),
+    (32, 32, 32), (64, 64, 64), (128, 128, 128), (256, 256, 256),
+)
+
+# per case limit on grid points, python level loops and plots would
+# take minutes on the largest grids
+POINTWISE_POINTS = 1 << 16
+SHOW_POINTS = 1 << 15
+DEFAULT_POINTS = 1 << 24
+
+# relative change that counts as a regression
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.25
+
+# operations per call in the size independent Vector cases
+VECTOR_OPS = 10000
+
+
+def mesh(shape):
+    # loadField takes x, y, z meshgrids, 3d grids are stored [z][x][y]
+    x, y = shape[-2:]
+    if len(shape) == 2:
+        return np.meshgrid(np.arange(x, dtype=float), np.arange(y, dtype=float), indexing="ij")
+    z = shape[0]
+    zz, xx, yy = np.meshgrid(np.arange(z, dtype=float), np.arange(x, dtype=float),
+                             np.arange(y, dtype=float), indexing="ij")
+    return xx, yy, zz
+
+
+def scalarFun(point):
+    return point[0] * point[1]
+
+
+def vectorFun(point):
+    return Vector(point[1], -point[0], 0.0)
+
+
+def vectorizedScalar(coords):
+    return coords[0] * coords[1]
+
+
+def vectorizedVector(coords):
+    return coords[1], -coords[0], np.zeros_like(coords[0])
+
+
+def scalarField(shape):
+    return ScalarField(np.random.default_rng(0).random(shape), copy=False)
+
+
+def vectorField(shape):
+    return VectorField(np.random.default_rng(0).random(shape + (3,)), copy=False)
+
+
+def loadFieldCase(cls, fun, mode):
+    def setup(shape):
+        coords = mesh(shape)
+        return lambda: cls.loadField([0, 0, 0], fun, *coords, mode=mode)
+    return setup
+
+
+# derivatives go through the field's cache, every run gets a fresh
+# cache so the cost of differentiating is what is measured
+def operatorCase(make, op):
+    def setup(shape):
+        field = make(shape)
+
+        def run():
+            field.invalidate()
+            return op(field)
+        return run
+    return setup
+
+
+def arithmeticCase(make, op):
+    def setup(shape):
+        a = make(shape)
+        b = make(shape)
+        return lambda: op(a, b)
+    return setup
+
+
+def showCase(make):
+    def setup(shape):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        field = make(shape)
+
+        def run():
+            with warnings.catch_warnings():
+                # Agg can't show, the drawing up to there is what counts
+                warnings.simplefilter("ignore")
+                field.show()
+            plt.close("all")
+        return run
+    return setup
+
+
+# the coordinate and decimation work of show without any drawing
+def prepareCase(make, values):
+    def setup(shape):
+        field = make(shape)
+        return lambda: rendering.prepare(values(field), len(shape), field.origin, field.dist)
+    return setup
+
+
+def vectorCase(op):
+    def setup(shape):
+        a = Vector(1.0, 2.0, 3.0)
+        b = Vector(4.0, 5.0, 6.0)
+
+        def run():
+            for _ in range(VECTOR_OPS):
+                op(a, b)
+        return run
+    return setup
+
+
+# name -> (setup(shape) returning the callable to time, point limit);
+# cases with a None limit don't depend on the grid and run once
+CASES = {
+    "Vector.add": (vectorCase(lambda a, b: a + b), None),
+    "Vector.dot": (vectorCase(lambda a, b: a * b), None),
+    "Vector.cross": (vectorCase(lambda a, b: a ** b), None),
+    "Vector.scale": (vectorCase(lambda a, b: a * 2.0), None),
+    "Vector.mag": (vectorCase(lambda a, b: a.mag()), None),
+
+    "ScalarField.add": (arithmeticCase(scalarField, lambda a, b: a + b), DEFAULT_POINTS),
+    "ScalarField.mul": (arithmeticCase(scalarField, lambda a, b: a * b), DEFAULT_POINTS),
+    "ScalarField.iadd": (arithmeticCase(scalarField, lambda a, b: a.__iadd__(b)), DEFAULT_POINTS),
+    "VectorField.add": (arithmeticCase(vectorField, lambda a, b: a + b), DEFAULT_POINTS),
+    "VectorField.dot": (arithmeticCase(vectorField, lambda a, b: a * b), DEFAULT_POINTS),
+    "VectorField.cross": (arithmeticCase(vectorField, lambda a, b: a ** b), DEFAULT_POINTS),
+
+    "loadField.scalar.pointwise": (loadFieldCase(ScalarField, scalarFun, "pointwise"), POINTWISE_POINTS),
+    "loadField.scalar.vectorized": (loadFieldCase(ScalarField, vectorizedScalar, "vectorized"), DEFAULT_POINTS),
+    "loadField.scalar.parallel": (loadFieldCase(ScalarField, scalarFun, "parallel"), POINTWISE_POINTS),
+    "loadField.vector.pointwise": (loadFieldCase(VectorField, vectorFun, "pointwise"), POINTWISE_POINTS),
+    "loadField.vector.vectorized": (loadFieldCase(VectorField, vectorizedVector, "vectorized"), DEFAULT_POINTS),
+    "loadField.vector.parallel": (loadFieldCase(VectorField, vectorFun, "parallel"), POINTWISE_POINTS),
+
+    "gradient": (operatorCase(scalarField, lambda f: f.gradient()), DEFAULT_POINTS),
+    "laplacian": (operatorCase(scalarField, lambda f: f.laplacian()), DEFAULT_POINTS),
+    "divergence": (operatorCase(vectorField, lambda f: f.divergence()), DEFAULT_POINTS),
+    "curl": (operatorCase(vectorField, lambda f: f.curl()), DEFAULT_POINTS),
+
+    "show.scalar": (showCase(scalarField), SHOW_POINTS),
+    "show.vector": (showCase(vectorField), SHOW_POINTS),
+    "show.prepare.scalar": (prepareCase(scalarField, lambda f: f.field), DEFAULT_POINTS),
+    "show.prepare.vector": (prepareCase(vectorField, lambda f: f.data), DEFAULT_POINTS),
+}
+
+
+def key(name, shape):
+    if shape is None:
+        return name
+    return "{}@{}".format(name, "x".join(str(n) for n in shape))
+
+
+# best wall time over repeat runs, then the tracemalloc peak of one more
+# run on its own since tracing slows everything down
+def measure(run, repeat=3):
+    run()
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": seconds, "peakBytes": peak}
+
+
+def runCases(names=None, sizes=SIZES, repeat=3, maxPoints=None, log=None):
+    results = {}
+
+    for name, (setup, limit) in CASES.items():
+        if names and not any(part in name for part in names):
+            continue
+
+        for shape in ([None] if limit is None else sizes):
+            if shape is not None:
+                points = int(np.prod(shape))
+                if points > limit or (maxPoints is not None and points > maxPoints):
+                    continue
+
+            result = measure(setup(shape), repeat)
+            results[key(name, shape)] = result
+            if log is not None:
+                log("{:<40} {:12.6f} s {:12d} B".format(
+                    key(name, shape), result["seconds"], result["peakBytes"]))
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+
+# (key, metric, baseline, current) for every case that got worse by more
+# than the threshold, cases missing on either side are skipped
+def compare(current, baseline, timeThreshold=TIME_THRESHOLD, memoryThreshold=MEMORY_THRESHOLD):
+    regressions = []
+
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+
+        for metric, threshold in (("seconds", timeThreshold), ("peakBytes", memoryThreshold)):
+            if result[metric] > before[metric] * (1 + threshold):
+                regressions.append((name, metric, before[metric], result[metric]))
+
+    return regressions
+
+
+def parseSize(text):
+    return tuple(int(n) for n in text.lower().split("x"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cases", nargs="*", help="only run cases whose name contains one of these")
+    parser.add_argument("--sizes", nargs="+", type=parseSize, default=SIZES,
+                        help="grid sizes such as 64x64 or 32x32x32")
+    parser.add_argument("--max-points", type=int, default=None,
+                        help="skip grids with more points than this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write the results as json")
+    parser.add_argument("--baseline", help="json results to compare against")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    current = runCases(args.cases, args.sizes, args.repeat, args.max_points, log=print)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(current, baseline, args.time_threshold, args.memory_threshold)
+    for name, metric, before, after in regressions:
+        print("regression {:<40} {:<10} {:.4g} -> {:.4g}".format(name, metric, before, after))
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
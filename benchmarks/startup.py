@@ -0,0 +1,55 @@
+# measures the time a fresh interpreter takes to import the package and
+# lists the heavy modules the import pulled in, each run is a new process
+# so nothing is cached in sys.modules
+# run from the directory containing the package:
+#   python -m vector_calculus.benchmarks.startup
+import json
+import statistics
+import subprocess
+import sys
+
+# modules that compute only users shouldn't have to load
+HEAVY = ("matplotlib", "scipy", "pandas")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {package}
+seconds = time.perf_counter() - start
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+
+def importTime(package="vector_calculus", runs=10):
+    code = PROBE.format(package=package, heavy=HEAVY)
+    times = []
+    heavy = set()
+
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output)
+        times.append(result["seconds"])
+        heavy.update(result["heavy"])
+
+    return {
+        "best": min(times),
+        "median": statistics.median(times),
+        "heavy": sorted(heavy),
+    }
+
+
+def main():
+    results = {
+        "numpy": importTime("numpy"),
+        "vector_calculus": importTime(),
+    }
+    print(json.dumps(results, indent=2))
+
+    # the package should only add its own modules on top of numpy
+    return 1 if results["vector_calculus"]["heavy"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
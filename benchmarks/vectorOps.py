@@ -0,0 +1,48 @@
+# reports memory per Vector instance and time per operator call
+# run from the directory containing the package:
+#   python -m vector_calculus.benchmarks.vectorOps
+import timeit
+import tracemalloc
+
+from ..vector import Vector
+
+
+def memoryPerInstance(count=100000):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    vectors = [Vector(float(i), float(i), float(i)) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # the list itself holds one pointer per element
+    return (after - before) / len(vectors) - 8
+
+
+def timePerOp(number=200000):
+    a = Vector(1.0, 2.0, 3.0)
+    b = Vector(4.0, 5.0, 6.0)
+
+    ops = {
+        "Vector()": lambda: Vector(1.0, 2.0, 3.0),
+        "a + b": lambda: a + b,
+        "a - b": lambda: a - b,
+        "a * b (dot)": lambda: a * b,
+        "a * 2.0": lambda: a * 2.0,
+        "a ** b (cross)": lambda: a ** b,
+        "a / 2.0": lambda: a / 2.0,
+        "a.mag()": lambda: a.mag(),
+        "a[1]": lambda: a[1],
+    }
+
+    return {name: min(timeit.repeat(op, number=number, repeat=3)) / number
+            for name, op in ops.items()}
+
+
+def main():
+    print("memory per instance: {:.0f} bytes".format(memoryPerInstance()))
+    for name, seconds in timePerOp().items():
+        print("{:<16} {:8.1f} ns".format(name, seconds * 1e9))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+
+# upper bound on the memory held by one field's cached derivatives
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+
+# least recently used store for the partial derivatives of one field,
+# keyed by (component, axis, spacing, order) so divergence, curl,
+# gradient and jacobian share whatever the others already computed;
+# the owning field clears it whenever its values are replaced
+class DerivativeCache:
+
+    def __init__(self, maxBytes=DEFAULT_MAX_BYTES):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "DerivativeCache {} entries, {} bytes".format(len(self.entries), self.nbytes)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    # returns the cached array for key or stores the result of compute,
+    # cached arrays are read only so callers can't corrupt them
+    def get(self, key, compute):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        value = compute()
+
+        if value.nbytes <= self.maxBytes:
+            value.setflags(write=False)
+            self.entries[key] = value
+            self.nbytes += value.nbytes
+            self._evict()
+
+        return value
+
+    def _evict(self):
+        while self.nbytes > self.maxBytes and self.entries:
+            _, value = self.entries.popitem(last=False)
+            self.nbytes -= value.nbytes
+
+    def resize(self, maxBytes):
+        self.maxBytes = maxBytes
+        self._evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,72 @@
+import numpy as np
+from .precision import floatType
+
+
+# grid axis that the x, y and z components vary along for each
+# dimensionality, 3d fields are laid out as [z][x][y] while 1d and 2d
+# fields are [x] and [x][y]; None means the field has no such axis
+AXES = {
+    1: (0, None, None),
+    2: (0, 1, None),
+    3: (1, 2, 0),
+}
+
+# "fd" is np.gradient style finite differences, "spectral" the fft based
+# derivatives for periodic fields in spectral.py
+METHODS = ("fd", "spectral")
+
+
+def checkMethod(method):
+    if method not in METHODS:
+        raise ValueError(
+            "Unknown differentiation method {}, expected one of {}".format(method, METHODS))
+
+
+# same result as np.gradient(f, spacing, axis=axis, edge_order=order)
+# with uniform spacing, but written straight into out so no
+# temporaries of the full grid size are allocated
+def gradientInto(f, spacing, axis, out=None, order=1):
+    f = np.asarray(f)
+    n = f.shape[axis]
+
+    if order not in (1, 2):
+        raise ValueError("'edge_order' greater than 2 not supported")
+
+    if n < order + 1:
+        raise ValueError(
+            "Shape of the array too small to calculate a numerical gradient, at least (edge_order + 1) elements are required")
+
+    if out is None:
+        out = np.empty(f.shape, dtype=floatType(f))
+
+    def take(start, stop):
+        index = [slice(None)] * f.ndim
+        index[axis] = slice(start, stop)
+        return tuple(index)
+
+    # central differences for the interior points
+    if n > 2:
+        inner = out[take(1, -1)]
+        np.subtract(f[take(2, None)], f[take(None, -2)], out=inner)
+        np.divide(inner, 2. * spacing, out=inner)
+
+    first = out[take(0, 1)]
+    last = out[take(-1, None)]
+
+    # one sided differences on the edges
+    if order == 1:
+        np.subtract(f[take(1, 2)], f[take(0, 1)], out=first)
+        np.divide(first, spacing, out=first)
+
+        np.subtract(f[take(-1, None)], f[take(-2, -1)], out=last)
+        np.divide(last, spacing, out=last)
+
+    # second order one sided differences, same coefficients as numpy
+    else:
+        a, b, c = -1.5 / spacing, 2. / spacing, -0.5 / spacing
+        first[...] = a * f[take(0, 1)] + b * f[take(1, 2)] + c * f[take(2, 3)]
+
+        a, b, c = 0.5 / spacing, -2. / spacing, 1.5 / spacing
+        last[...] = a * f[take(-3, -2)] + b * f[take(-2, -1)] + c * f[take(-1, None)]
+
+    return out
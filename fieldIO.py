@@ -0,0 +1,126 @@
+import json
+import struct
+import zlib
+
+import numpy as np
+from .slabs import defaultSlab, slabRanges
+
+
+# native field files:
+#   MAGIC, the header length as a little endian uint32 and a json header
+#   holding kind, shape, dtype, origin, dist and compression, padded with
+#   spaces so the data starts on an ALIGN byte boundary; then the raw
+#   array in C order, or for compression="zlib" a sequence of chunks of
+#   rows along the first axis, each prefixed by its compressed length as
+#   a little endian uint64
+# filenames ending in .npz are written with numpy instead
+MAGIC = b"VCFIELD\x01"
+ALIGN = 64
+KINDS = ("scalar", "vector")
+COMPRESSIONS = (None, "zlib")
+
+
+def checkCompression(compression):
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            "Unknown compression {}, expected one of {}".format(compression, COMPRESSIONS))
+
+
+def isNpz(filename):
+    return str(filename).endswith(".npz")
+
+
+def header(kind, data, origin, dist, compression=None):
+    meta = {
+        "kind": kind,
+        "shape": list(data.shape),
+        "dtype": data.dtype.str,
+        "origin": [float(v) for v in origin],
+        "dist": [float(v) for v in dist],
+        "compression": compression,
+    }
+    text = json.dumps(meta).encode("utf-8")
+
+    size = len(MAGIC) + 4 + len(text)
+    text += b" " * (-size % ALIGN)
+    return MAGIC + struct.pack("<I", len(text)) + text
+
+
+# writes data slab by slab so memory mapped fields never get read whole,
+# level is the zlib level, chunk the rows per compressed chunk
+def save(filename, kind, data, origin, dist, compression=None, level=6, chunk=None):
+    checkCompression(compression)
+
+    if isNpz(filename):
+        savez = np.savez if compression is None else np.savez_compressed
+        savez(filename, data=np.asarray(data), kind=kind,
+              origin=np.asarray(origin, dtype=float), dist=np.asarray(dist, dtype=float))
+        return
+
+    if chunk is None:
+        chunk = defaultSlab(data.shape, data.dtype.itemsize)
+
+    with open(filename, "wb") as f:
+        f.write(header(kind, data, origin, dist, compression))
+
+        for start, stop in slabRanges(data.shape[0], chunk):
+            rows = np.ascontiguousarray(data[start:stop])
+            if compression is None:
+                f.write(memoryview(rows).cast("B"))
+            else:
+                packed = zlib.compress(memoryview(rows).cast("B"), level)
+                f.write(struct.pack("<Q", len(packed)))
+                f.write(packed)
+
+
+def readHeader(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a field file")
+
+    size, = struct.unpack("<I", f.read(4))
+    meta = json.loads(f.read(size).decode("utf-8"))
+    meta["offset"] = len(MAGIC) + 4 + size
+    return meta
+
+
+# returns (kind, data, origin, dist); mmap=True maps an uncompressed
+# file instead of reading it, mode is passed on to np.memmap
+def load(filename, mmap=False, mode="r"):
+    if isNpz(filename):
+        if mmap:
+            raise ValueError("Memory mapping needs the raw field format, not .npz")
+        with np.load(filename) as archive:
+            return (str(archive["kind"]), archive["data"],
+                    archive["origin"].tolist(), archive["dist"].tolist())
+
+    with open(filename, "rb") as f:
+        meta = readHeader(f)
+        shape = tuple(meta["shape"])
+        dtype = np.dtype(meta["dtype"])
+
+        if meta["compression"] is None:
+            if mmap:
+                data = np.memmap(filename, dtype=dtype, mode=mode,
+                                 offset=meta["offset"], shape=shape)
+            else:
+                data = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        else:
+            if mmap:
+                raise ValueError("Compressed field files can't be memory mapped")
+            checkCompression(meta["compression"])
+            data = np.empty(shape, dtype=dtype)
+            flat = memoryview(data.reshape(-1)).cast("B")
+            pos = 0
+            while pos < len(flat):
+                size, = struct.unpack("<Q", f.read(8))
+                rows = zlib.decompress(f.read(size))
+                flat[pos:pos + len(rows)] = rows
+                pos += len(rows)
+
+    return meta["kind"], data, meta["origin"], meta["dist"]
+
+
+def checkKind(kind, expected):
+    if kind != expected:
+        raise TypeError(
+            "Expected a {} field file, got a {} field".format(expected, kind))
@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from .vector import Vector
+
+
+# pointwise calls fun once per grid location with a tuple of scalar
+# coordinates, vectorized calls it once with the tuple of whole
+# meshgrid arrays and expects full arrays back, parallel is pointwise
+# spread over a pool of workers in contiguous chunks of the grid
+MODES = ("pointwise", "vectorized", "parallel")
+
+EXECUTORS = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+def meshAxes(x, y, z=[]):
+    axes = (np.asarray(x), np.asarray(y))
+    if len(z) != 0:
+        axes += (np.asarray(z),)
+
+    for axis in axes[1:]:
+        if(axis.shape != axes[0].shape):
+            raise TypeError(
+                "Dimensions of the axes are different {}, {}".format(axes[0].shape, axis.shape))
+
+    return axes
+
+
+def checkMode(mode):
+    if mode not in MODES:
+        raise ValueError(
+            "Unknown evaluation mode {}, expected one of {}".format(mode, MODES))
+
+
+# unpacks whatever fun returned for one point into (x, y, z)
+def vectorComponents(vec):
+    if isinstance(vec, Vector):
+        return vec.x, vec.y, vec.z
+
+    vec = tuple(vec)
+    if len(vec) == 2:
+        return vec + (0,)
+    return vec
+
+
+# [start, stop) ranges over the flattened grid, the default gives each
+# worker about four chunks so uneven chunks still balance out
+def chunkRanges(size, workers, chunksize=None):
+    if chunksize is None:
+        chunksize = max(1, -(-size // (workers * 4)))
+
+    return [(start, min(start + chunksize, size))
+            for start in range(0, size, chunksize)]
+
+
+# runs in the worker process, the chunk comes back as one array that
+# is written into the output slice by the parent
+def _evaluateChunk(fun, coords, vector, dtype=None):
+    if vector:
+        return np.array([vectorComponents(fun(point)) for point in zip(*coords)], dtype=float if dtype is None else dtype)
+    return np.array([fun(point) for point in zip(*coords)], dtype=dtype)
+
+
+# threads share the output so every point is written straight into it
+def _fillChunk(fun, coords, vector, out):
+    for i, point in enumerate(zip(*coords)):
+        out[i] = vectorComponents(fun(point)) if vector else fun(point)
+
+
+# whether fun can be sent to a worker process: it has to pickle, and
+# workers that aren't forked import it by module, which fails for a
+# __main__ without a file (notebooks, the REPL, scripts read from stdin)
+def picklable(fun):
+    try:
+        pickle.dumps(fun)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+
+    if getattr(fun, "__module__", None) == "__main__" and multiprocessing.get_start_method() != "fork":
+        return os.path.isfile(getattr(sys.modules["__main__"], "__file__", None) or "")
+    return True
+
+
+# fills out chunk by chunk on a pool of the given executor
+def _run(executor, fun, flat, vector, dtype, workers, ranges, out):
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        if executor == "thread":
+            futures = [pool.submit(_fillChunk, fun, tuple(axis[start:stop] for axis in flat),
+                                   vector, out[start:stop]) for start, stop in ranges]
+            for future in futures:
+                future.result()
+        else:
+            futures = [pool.submit(_evaluateChunk, fun, tuple(axis[start:stop] for axis in flat),
+                                   vector, dtype) for start, stop in ranges]
+            for (start, stop), future in zip(ranges, futures):
+                out[start:stop] = future.result()
+
+
+# evaluates fun over the flattened grid in parallel, chunks are written
+# back by position so the result doesn't depend on completion order;
+# pointwise python code holds the GIL so only the process executor runs
+# it in parallel, it needs fun to be picklable and falls back to
+# threads (which only help when fun releases the GIL, e.g. in numpy
+# calls) for lambdas, closures and functions the workers can't import,
+# or when the worker processes die; dtype fixes the type of the output,
+# by default it's float64 for vectors and follows the first point for
+# scalars
+def evaluateParallel(fun, axes, vector, workers=None, chunksize=None, executor="process", dtype=None):
+    if executor not in EXECUTORS:
+        raise ValueError(
+            "Unknown executor {}, expected one of {}".format(executor, tuple(EXECUTORS)))
+
+    if executor == "process" and not picklable(fun):
+        executor = "thread"
+
+    shape = axes[0].shape
+    flat = tuple(axis.reshape(-1) for axis in axes)
+    size = flat[0].size
+    workers = workers or os.cpu_count() or 1
+
+    if vector:
+        out = np.empty((size, 3), dtype=float if dtype is None else dtype)
+    elif dtype is not None:
+        out = np.empty(size, dtype=dtype)
+    else:
+        # the dtype comes from the first point so the output can be
+        # allocated before any worker starts
+        first = fun(tuple(axis[0] for axis in flat)) if size else 0.0
+        out = np.empty(size, dtype=np.result_type(np.asarray(first), float))
+
+    ranges = chunkRanges(size, workers, chunksize)
+
+    try:
+        _run(executor, fun, flat, vector, dtype, workers, ranges, out)
+    except BrokenProcessPool:
+        _run("thread", fun, flat, vector, dtype, workers, ranges, out)
+
+    return out.reshape(shape + (3,) if vector else shape)
+
+
+def evaluateScalar(fun, axes, mode="pointwise", dtype=None, **parallel):
+    checkMode(mode)
+    shape = axes[0].shape
+
+    if mode == "vectorized":
+        return np.array(np.broadcast_to(fun(axes), shape), dtype=dtype)
+
+    if mode == "parallel":
+        return evaluateParallel(fun, axes, False, dtype=dtype, **parallel)
+
+    field = [fun(tuple(axis[loc] for axis in axes))
+             for loc in np.ndindex(shape)]
+
+    return np.array(field, dtype=dtype).reshape(shape)
+
+
+# returns the (*shape, 3) component array used by VectorField, in the
+# vectorized mode fun gives back a 2 or 3 tuple of component arrays
+def evaluateVector(fun, axes, mode="pointwise", dtype=None, **parallel):
+    checkMode(mode)
+    shape = axes[0].shape
+
+    if mode == "vectorized":
+        components = fun(axes)
+        if len(components) not in (2, 3):
+            raise TypeError(
+                "Expected 2 or 3 component arrays, got {}".format(len(components)))
+
+        data = np.zeros(shape + (3,), dtype=float if dtype is None else dtype)
+        for comp, values in enumerate(components):
+            data[..., comp] = values
+        return data
+
+    if mode == "parallel":
+        return evaluateParallel(fun, axes, True, dtype=dtype, **parallel)
+
+    data = np.empty(shape + (3,), dtype=float if dtype is None else dtype)
+    for loc in np.ndindex(shape):
+        data[loc] = vectorComponents(fun(tuple(axis[loc] for axis in axes)))
+
+    return data
@@ -0,0 +1,116 @@
+import numpy as np
+from .differential import AXES
+from .spectral import axisSpacings
+from .precision import accumulator
+
+
+# quadrature rules for grid integrals, simpson falls back to the
+# trapezoid rule on the last interval of axes with an even point count
+RULES = ("trapezoid", "simpson")
+
+
+def checkRule(rule):
+    if rule not in RULES:
+        raise ValueError(
+            "Unknown quadrature rule {}, expected one of {}".format(rule, RULES))
+
+
+# quadrature weights of n equally spaced points
+def weights(n, h, rule="trapezoid"):
+    checkRule(rule)
+    w = np.full(n, float(h))
+
+    if n == 1:
+        return np.zeros(1)
+
+    if rule == "trapezoid" or n == 2:
+        w[0] = w[-1] = h / 2
+        return w
+
+    # composite simpson over the largest odd number of points
+    m = n if n % 2 == 1 else n - 1
+    w[:m] = h / 3
+    w[1:m - 1:2] *= 4
+    w[2:m - 1:2] *= 2
+    if m < n:
+        w[m - 1] += h / 2
+        w[m] = h / 2
+
+    return w
+
+
+# contracts the leading axes of values (one per spacing) with the
+# quadrature weights, trailing axes such as the vector components stay;
+# sums run in the floating type of values, float64 in mixed precision
+def gridIntegral(values, spacings, rule="trapezoid"):
+    values = np.asarray(values)
+    dtype = accumulator(values)
+    for h in spacings:
+        w = weights(values.shape[0], h, rule).astype(dtype, copy=False)
+        values = np.tensordot(w, values.astype(dtype, copy=False), axes=(0, 0))
+
+    # a plain scalar rather than a 0d array for scalar fields
+    return values[()]
+
+
+def volumeIntegral(values, ndim, dist, rule="trapezoid"):
+    return gridIntegral(values, axisSpacings(ndim, dist), rule)
+
+
+# points along each polyline subdivided into samples pieces per segment
+def subdivide(polylines, samples):
+    start = polylines[..., :-1, :]
+    delta = polylines[..., 1:, :] - start
+    t = np.arange(samples) / samples
+
+    points = start[..., :, np.newaxis, :] + t[:, np.newaxis] * delta[..., :, np.newaxis, :]
+    points = points.reshape(polylines.shape[:-2] + (-1, 3))
+    return np.concatenate((points, polylines[..., -1:, :]), axis=-2)
+
+
+# integral of F . dl along (K, 3) polylines, or a (B, K, 3) batch of them,
+# with the trapezoid rule after splitting every segment into samples
+# pieces; field is sampled at all points in one call
+def lineIntegral(field, polylines, samples=1, mode="trilinear"):
+    polylines = np.asarray(polylines, dtype=float)
+    if polylines.shape[-1] == 2:
+        polylines = np.concatenate((polylines, np.zeros(polylines.shape[:-1] + (1,))), axis=-1)
+
+    points = subdivide(polylines, samples)
+    values = field.sample(points.reshape(-1, 3), mode).reshape(points.shape)
+
+    dtype = accumulator(values)
+    dl = np.diff(points, axis=-2).astype(dtype, copy=False)
+    values = values.astype(dtype, copy=False)
+    average = 0.5 * (values[..., 1:, :] + values[..., :-1, :])
+    return np.einsum("...ki,...ki->...", average, dl)
+
+
+# flux of the field through the grid plane at index along the direction
+# along (0, 1, 2 for x, y, z), the normal points towards +along; on a 2d
+# grid this is the flux per unit depth through a grid line
+def planeFlux(data, ndim, dist, along, index, rule="trapezoid"):
+    axis = AXES[ndim][along]
+    if axis is None:
+        raise ValueError("The field has no axis along direction {}".format(along))
+
+    plane = np.take(data[..., along], index, axis=axis)
+    spacings = axisSpacings(ndim, dist)
+    return gridIntegral(plane, spacings[:axis] + spacings[axis + 1:], rule)
+
+
+# flux through a triangulated surface, vertices is (V, 3) and faces (F, 3)
+# vertex indices; the field is sampled at the vertices and averaged
+# over each triangle, normals follow the right hand rule on the vertex
+# order
+def surfaceFlux(field, vertices, faces, mode="trilinear"):
+    vertices = np.asarray(vertices, dtype=float)
+    faces = np.asarray(faces, dtype=np.intp)
+
+    values = field.sample(vertices, mode)
+    dtype = accumulator(values)
+    a, b, c = (vertices[faces[:, corner]] for corner in range(3))
+    area = (0.5 * np.cross(b - a, c - a)).astype(dtype, copy=False)
+    mean = values.astype(dtype, copy=False)[faces].mean(axis=1)
+
+    return np.einsum("fi,fi->", mean, area)
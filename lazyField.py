@@ -0,0 +1,257 @@
+import numpy as np
+from .vector import Vector
+from .precision import floatType
+
+
+# grid elements evaluated per chunk, sized so that the operands and the
+# scratch buffers of a typical expression stay within the cpu caches
+CHUNK_ELEMENTS = 1 << 15
+
+UFUNCS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "pow": np.power,
+    "truediv": np.true_divide,
+    "floordiv": np.floor_divide,
+}
+
+
+# scratch buffers keyed by (shape, dtype) that are handed out and given
+# back while a chunk is evaluated, so every chunk after the first one
+# runs without allocating
+class BufferPool:
+
+    def __init__(self):
+        self.free = {}
+
+    def take(self, shape, dtype):
+        buffers = self.free.get((shape, dtype))
+        if buffers:
+            return buffers.pop()
+        return np.empty(shape, dtype=dtype)
+
+    def give(self, buf):
+        self.free.setdefault((buf.shape, buf.dtype), []).append(buf)
+
+
+# an unevaluated expression over ScalarField / VectorField operands,
+# built with field.lazy() and the usual operators; evaluate() runs the
+# whole tree one chunk at a time so no full size temporaries are
+# created, anything else (gradient, curl, show, ...) evaluates the
+# expression and forwards to the resulting field. The operands are read
+# when the expression is evaluated, not when it is built, so writes into
+# them in between are seen and every evaluation computes afresh
+class LazyField:
+
+    # keeps ndarray operators from claiming mixed expressions
+    __array_ufunc__ = None
+
+    def __init__(self, op, operands, vector, shape, origin, dist, sample):
+        self.op = op
+        self.operands = operands
+        self.vector = vector
+        self.shape = shape
+        self.origin = origin
+        self.dist = dist
+        # a one element result of the expression, used for its dtype
+        self.sample = sample
+
+    @classmethod
+    def leaf(cls, val):
+        from .scalarField import ScalarField
+        from .vectorField import VectorField
+
+        if isinstance(val, LazyField):
+            return val
+        if isinstance(val, ScalarField):
+            return cls(None, (val,), False, val.field.shape, val.origin, val.dist,
+                       np.ones(1, dtype=val.field.dtype))
+        if isinstance(val, VectorField):
+            return cls(None, (val,), True, val.shape, val.origin, val.dist,
+                       np.ones((1, 3), dtype=val.data.dtype))
+        if isinstance(val, Vector):
+            val = np.array([val.x, val.y, val.z])
+            return cls(None, (val,), True, None, None, None, val)
+        return cls(None, (val,), np.shape(val) == (3,), None, None, None, val)
+
+    def __repr__(self):
+        return "LazyField {} ({})".format(self.shape, self.op or "leaf")
+
+    def __str__(self):
+        return self.__repr__()
+
+    def _binary(self, name, val, reflected=False):
+        from .scalarField import ScalarField
+        from .vectorField import VectorField
+
+        # fields, Vectors, numbers and 0-d or 3 element arrays, other
+        # arrays have no grid to be chunked along, wrap them in a field
+        if not isinstance(val, (LazyField, ScalarField, VectorField, Vector, np.ndarray, int, float, complex, np.number)):
+            return NotImplemented
+        if isinstance(val, np.ndarray) and val.shape not in ((), (3,)):
+            raise TypeError(
+                "Expected a 0-d or 3 element array, got shape {}".format(val.shape))
+        # a Vector takes the precision of the expression
+        if isinstance(val, Vector):
+            val = np.array([val.x, val.y, val.z], dtype=floatType(self.sample))
+
+        a, b = self, LazyField.leaf(val)
+        if reflected:
+            a, b = b, a
+
+        if a.shape is not None and b.shape is not None and a.shape != b.shape:
+            raise TypeError(
+                "Dimensions of the arguments are different {}, {}".format(a.shape, b.shape))
+
+        if a.vector and b.vector and name == "mul":
+            name, vector = "dot", False
+            sample = np.einsum("...i,...i->...", a.sample, b.sample)
+        elif a.vector and b.vector and name == "pow":
+            name, vector = "cross", True
+            sample = np.cross(a.sample, b.sample)
+        else:
+            vector = a.vector or b.vector
+            sample = UFUNCS[name](a.sample, b.sample)
+
+        grid = a if a.shape is not None else b
+        return LazyField(name, (a, b), vector, grid.shape, grid.origin, grid.dist, sample)
+
+    def __add__(self, val):
+        return self._binary("add", val)
+
+    def __radd__(self, val):
+        return self._binary("add", val, True)
+
+    def __sub__(self, val):
+        return self._binary("sub", val)
+
+    def __rsub__(self, val):
+        return self._binary("sub", val, True)
+
+    def __mul__(self, val):
+        return self._binary("mul", val)
+
+    def __rmul__(self, val):
+        return self._binary("mul", val, True)
+
+    def __pow__(self, val):
+        return self._binary("pow", val)
+
+    def __rpow__(self, val):
+        return self._binary("pow", val, True)
+
+    def __truediv__(self, val):
+        return self._binary("truediv", val)
+
+    def __rtruediv__(self, val):
+        return self._binary("truediv", val, True)
+
+    def __floordiv__(self, val):
+        return self._binary("floordiv", val)
+
+    def __rfloordiv__(self, val):
+        return self._binary("floordiv", val, True)
+
+    def __neg__(self):
+        return LazyField("neg", (self,), self.vector, self.shape, self.origin, self.dist, -self.sample)
+
+    # index tuples of about CHUNK_ELEMENTS elements each: fixed indices
+    # along the leading axes and a slice of the next one, as many axes
+    # are indexed as it takes for the trailing block to fit; rows forces
+    # slices of that many rows of the first axis
+    def _chunks(self, rows=None):
+        inner = 3 if self.vector else 1
+        axis = 0
+        if rows is None:
+            while axis < len(self.shape) - 1 and \
+                    np.prod(self.shape[axis + 1:], dtype=np.int64) * inner > CHUNK_ELEMENTS:
+                axis += 1
+            block = int(np.prod(self.shape[axis + 1:], dtype=np.int64)) * inner
+            rows = max(1, CHUNK_ELEMENTS // max(block, 1))
+
+        n = self.shape[axis]
+        for lead in np.ndindex(*self.shape[:axis]):
+            for start in range(0, n, rows):
+                yield lead + (slice(start, min(start + rows, n)),)
+
+    # evaluates the expression for the grid block at index, into target
+    # when given or into a pooled buffer that the caller gives back
+    def _chunk(self, index, pool, target=None):
+        if self.op is None:
+            value = self.operands[0]
+            if self.shape is not None:
+                value = _array(value)[index]
+            if target is not None:
+                target[...] = value
+            return value, False
+
+        args = []
+        pooled = []
+        for operand in self.operands:
+            value, fromPool = operand._chunk(index, pool)
+            if fromPool:
+                pooled.append(value)
+            # scalar grids broadcast along the component axis
+            if self.vector and not operand.vector and operand.shape is not None:
+                value = value[..., np.newaxis]
+            args.append(value)
+
+        rows = index[-1]
+        shape = (rows.stop - rows.start,) + self.shape[len(index):] + ((3,) if self.vector else ())
+        buf = target if target is not None else pool.take(shape, self.sample.dtype)
+
+        if self.op == "neg":
+            np.negative(args[0], out=buf)
+        elif self.op == "dot":
+            np.einsum("...i,...i->...", *np.broadcast_arrays(*args), out=buf)
+        elif self.op == "cross":
+            buf[...] = np.cross(*args)
+        else:
+            UFUNCS[self.op](*args, out=buf)
+
+        for value in pooled:
+            pool.give(value)
+
+        return buf, target is None
+
+    # runs the fused chunked evaluation, out may be a preallocated array
+    # of the result shape; chunk is the number of rows of the first axis
+    # per pass, by default the passes are sized by CHUNK_ELEMENTS
+    def evaluate(self, out=None, chunk=None):
+        from .scalarField import ScalarField
+        from .vectorField import VectorField
+
+        if self.shape is None:
+            raise TypeError("The expression has no field operand")
+
+        shape = self.shape + ((3,) if self.vector else ())
+        if out is None:
+            out = np.empty(shape, dtype=self.sample.dtype)
+        if(out.shape != shape):
+            raise TypeError(
+                "Dimensions of the output buffer are different {}, {}".format(out.shape, shape))
+
+        pool = BufferPool()
+        for index in self._chunks(chunk or None):
+            self._chunk(index, pool, target=out[index])
+
+        if self.vector:
+            return VectorField(out, origin=self.origin, dist=self.dist, copy=False)
+        return ScalarField(out, origin=self.origin, dist=self.dist, copy=False)
+
+    # differential operators and everything else a field offers, each
+    # access evaluates the expression again
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.evaluate(), name)
+
+
+# the current array of a field operand
+def _array(field):
+    from .vectorField import VectorField
+
+    if isinstance(field, VectorField):
+        return field.data
+    return field.field
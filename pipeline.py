@@ -0,0 +1,133 @@
+import queue
+import threading
+
+import numpy as np
+from .scalarField import ScalarField
+from .vectorField import VectorField
+
+
+# operators that take an out buffer; with reuse on, every frame of the
+# same grid shape and dtype gets the buffer the first such frame was
+# computed into
+BUFFERED = ("gradient", "divergence", "curl", "jacobian")
+
+# marks the end of the frames on the prefetch queue
+_DONE = object()
+
+
+class _Failure:
+
+    def __init__(self, error):
+        self.error = error
+
+
+# a chain of operators applied frame by frame to an iterable of fields,
+#   Pipeline(frames).then("gradient").then("divergence", order=2)
+# stages are method names of the fields or callables taking the field
+# and the extra arguments; iterating yields the result of the last stage
+# for each frame. The frames are pulled (and passed through load, e.g.
+# VectorField.load, when given) on a background thread at most prefetch
+# frames ahead, so loading overlaps the compute and only a few frames
+# are alive at once. With reuse the outputs of buffered stages are
+# overwritten by the next frame, copy anything that has to outlive it
+class Pipeline:
+
+    def __init__(self, frames, load=None, prefetch=2, reuse=True):
+        self.frames = frames
+        self.load = load
+        self.prefetch = max(1, prefetch)
+        self.reuse = reuse
+        self.stages = []
+        self.buffers = {}
+
+    def __repr__(self):
+        return "Pipeline {} stages".format(len(self.stages))
+
+    def then(self, op, *args, **kwargs):
+        self.stages.append((op, args, kwargs))
+        return self
+
+    def __iter__(self):
+        pending = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for frame in self.frames:
+                    if self.load is not None:
+                        frame = self.load(frame)
+                    if not put(frame):
+                        return
+            except BaseException as error:
+                put(_Failure(error))
+                return
+            put(_DONE)
+
+        worker = threading.Thread(target=produce, daemon=True)
+        worker.start()
+
+        try:
+            while True:
+                frame = pending.get()
+                if frame is _DONE:
+                    return
+                if isinstance(frame, _Failure):
+                    raise frame.error
+                yield self.apply(frame)
+        finally:
+            # the consumer may stop early, let the producer run out
+            stop.set()
+            worker.join()
+
+    # runs every stage on one field
+    def apply(self, field):
+        for index, (op, args, kwargs) in enumerate(self.stages):
+            field = self._stage(index, op, field, args, kwargs)
+        return field
+
+    def _stage(self, index, op, field, args, kwargs):
+        if callable(op):
+            return op(field, *args, **kwargs)
+
+        method = getattr(field, op)
+        if not (self.reuse and op in BUFFERED and "out" not in kwargs):
+            return self._wrap(field, method(*args, **kwargs))
+
+        key = (index, type(field), _gridShape(field), _dtype(field))
+        out = self.buffers.get(key)
+        result = method(*args, out=out, **kwargs)
+        self.buffers[key] = result
+        return self._wrap(field, result)
+
+    # divergence gives a bare array, it goes on as a ScalarField on the
+    # grid of the frame so the chain can continue
+    def _wrap(self, field, result):
+        if isinstance(result, np.ndarray) and result.shape == _gridShape(field):
+            return ScalarField(result, origin=field.origin, dist=field.dist, copy=False)
+        return result
+
+    # collects the results, only sensible when the last stage reduces
+    # each frame to something small
+    def collect(self):
+        return list(self)
+
+
+def _gridShape(field):
+    if isinstance(field, VectorField):
+        return field.shape
+    return field.field.shape
+
+
+def _dtype(field):
+    if isinstance(field, VectorField):
+        return field.data.dtype
+    return field.field.dtype
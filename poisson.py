@@ -0,0 +1,270 @@
+from functools import lru_cache
+
+import numpy as np
+from .differential import AXES
+from . import spectral
+from .spectral import axisSpacings
+from .precision import floatType
+
+
+# solves laplacian(phi) - shift * phi = f on the grid of a field
+#   boundary="periodic"   fft, phi is periodic with the grid period,
+#                         its mean is fixed to zero when shift is 0
+#   boundary="dirichlet"  the outermost layer of the grid is the
+#                         boundary, phi takes the matching entries of
+#                         values there (zero by default); solved with a
+#                         sine transform of the second order stencil
+# a mask of the cells that are unknowns (everything else keeps values)
+# describes domains that aren't a box, those go to the multigrid solver
+BOUNDARIES = ("periodic", "dirichlet")
+METHODS = ("auto", "fft", "multigrid")
+
+
+def solvePoisson(f, dist, boundary="periodic", values=None, mask=None, shift=0.0,
+                 method="auto", tol=1e-10, maxCycles=200):
+    f = np.asarray(f, dtype=floatType(f))
+    spacings = axisSpacings(f.ndim, dist)
+
+    if boundary not in BOUNDARIES:
+        raise ValueError(
+            "Unknown boundary {}, expected one of {}".format(boundary, BOUNDARIES))
+    if method not in METHODS:
+        raise ValueError(
+            "Unknown solver {}, expected one of {}".format(method, METHODS))
+
+    if method == "auto":
+        method = "fft" if mask is None else "multigrid"
+
+    if boundary == "periodic":
+        if method != "fft":
+            raise ValueError("Periodic problems are only solved with the fft")
+        return _periodic(f, spacings, shift)
+
+    if values is None:
+        values = np.zeros(f.shape, dtype=f.dtype)
+    else:
+        values = np.asarray(values, dtype=f.dtype)
+
+    if method == "fft":
+        if mask is not None:
+            raise ValueError("A mask needs the multigrid solver")
+        return _dirichlet(f, spacings, values, shift)
+
+    if mask is None:
+        mask = interiorMask(f.shape)
+    else:
+        mask = np.asarray(mask, dtype=bool) & interiorMask(f.shape)
+
+    return multigrid(f, spacings, values, mask, shift, tol, maxCycles)
+
+
+def _periodic(f, spacings, shift):
+    factor = spectral.laplacianFactor(f.shape, spacings) - shift
+    fhat = np.fft.rfftn(f)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        phihat = fhat / factor
+
+    # the constant mode is free when there is no shift
+    if shift == 0:
+        phihat.flat[0] = 0
+
+    return np.fft.irfftn(phihat, s=f.shape).astype(f.dtype, copy=False)
+
+
+def interiorMask(shape):
+    mask = np.zeros(shape, dtype=bool)
+    mask[tuple(slice(1, -1) for _ in shape)] = True
+    return mask
+
+
+# dst-i along one axis through a real fft of the odd extension
+def dst1(a, axis):
+    n = a.shape[axis]
+    shape = list(a.shape)
+    shape[axis] = 2 * (n + 1)
+
+    ext = np.zeros(shape, dtype=a.dtype)
+    index = [slice(None)] * a.ndim
+    index[axis] = slice(1, n + 1)
+    ext[tuple(index)] = a
+    index[axis] = slice(n + 2, None)
+    ext[tuple(index)] = -np.flip(a, axis=axis)
+
+    spectrum = np.fft.rfft(ext, axis=axis)
+    index[axis] = slice(1, n + 1)
+    return -spectrum[tuple(index)].imag / 2
+
+
+# eigenvalues of the second order laplacian with zero dirichlet
+# boundaries, cached per interior shape and spacing
+@lru_cache(maxsize=32)
+def dirichletEigenvalues(shape, spacings):
+    total = np.zeros(shape)
+    for axis, (n, h) in enumerate(zip(shape, spacings)):
+        view = [1] * len(shape)
+        view[axis] = n
+        j = np.arange(1, n + 1).reshape(view)
+        total = total + (2 * np.cos(np.pi * j / (n + 1)) - 2) / h ** 2
+
+    total.setflags(write=False)
+    return total
+
+
+# applies the second order laplacian of u on the interior points
+def laplacianInterior(u, spacings):
+    inner = tuple(slice(1, -1) for _ in u.shape)
+    result = np.zeros(tuple(n - 2 for n in u.shape), dtype=u.dtype)
+
+    for axis, h in enumerate(spacings):
+        up = list(inner)
+        down = list(inner)
+        up[axis] = slice(2, None)
+        down[axis] = slice(None, -2)
+        result += (u[tuple(up)] - 2 * u[inner] + u[tuple(down)]) / h ** 2
+
+    return result
+
+
+def _dirichlet(f, spacings, values, shift):
+    inner = tuple(slice(1, -1) for _ in f.shape)
+
+    # the known boundary values move to the right hand side
+    boundary = values.copy()
+    boundary[inner] = 0
+    rhs = f[inner] - laplacianInterior(boundary, spacings)
+
+    coeffs = rhs
+    for axis in range(rhs.ndim):
+        coeffs = dst1(coeffs, axis)
+
+    coeffs = coeffs / (dirichletEigenvalues(rhs.shape, spacings) - shift)
+
+    for axis in range(rhs.ndim):
+        coeffs = dst1(coeffs, axis) * (2. / (rhs.shape[axis] + 1))
+
+    phi = boundary
+    phi[inner] = coeffs
+    return phi
+
+
+# geometric multigrid v-cycles with weighted jacobi smoothing; cells
+# outside mask keep their value, the coarse grids take every other
+# point so any grid size works
+def multigrid(f, spacings, values, mask, shift=0.0, tol=1e-10, maxCycles=200):
+    u = np.where(mask, 0, values).astype(f.dtype)
+    scale = max(np.abs(f[mask]).max(initial=0), 1e-300)
+
+    for _ in range(maxCycles):
+        _vcycle(u, f, spacings, mask, shift)
+        if np.abs(_residual(u, f, spacings, mask, shift)).max(initial=0) <= tol * scale:
+            break
+
+    return u
+
+
+def _apply(u, spacings, shift):
+    result = np.zeros_like(u)
+    result[tuple(slice(1, -1) for _ in u.shape)] = laplacianInterior(u, spacings)
+    return result - shift * u
+
+
+def _residual(u, f, spacings, mask, shift):
+    return np.where(mask, f - _apply(u, spacings, shift), 0)
+
+
+def _smooth(u, f, spacings, mask, shift, sweeps):
+    diag = -sum(2. / h ** 2 for h in spacings) - shift
+    for _ in range(sweeps):
+        u += np.where(mask, (2. / 3.) * _residual(u, f, spacings, mask, shift) / diag, 0)
+
+
+# full weighting along every axis followed by taking every other point
+def _restrict(r):
+    for axis in range(r.ndim):
+        padded = np.pad(r, [(1, 1) if a == axis else (0, 0) for a in range(r.ndim)])
+        index = [slice(None)] * r.ndim
+        parts = []
+        for start in (0, 1, 2):
+            index[axis] = slice(start, start + r.shape[axis])
+            parts.append(padded[tuple(index)])
+        r = 0.25 * parts[0] + 0.5 * parts[1] + 0.25 * parts[2]
+
+    return r[tuple(slice(None, None, 2) for _ in r.shape)]
+
+
+# linear interpolation back onto the fine grid
+def _prolong(e, shape):
+    for axis, n in enumerate(shape):
+        fine = list(e.shape)
+        fine[axis] = n
+        result = np.zeros(fine, dtype=e.dtype)
+
+        index = [slice(None)] * e.ndim
+        index[axis] = slice(None, None, 2)
+        result[tuple(index)] = e
+
+        odd = [slice(None)] * e.ndim
+        odd[axis] = slice(1, n - 1, 2)
+        left = [slice(None)] * e.ndim
+        left[axis] = slice(0, (n - 1) // 2)
+        right = [slice(None)] * e.ndim
+        right[axis] = slice(1, (n - 1) // 2 + 1)
+        result[tuple(odd)] = 0.5 * (e[tuple(left)] + e[tuple(right)])
+
+        if n % 2 == 0:
+            last = [slice(None)] * e.ndim
+            last[axis] = slice(n - 1, n)
+            prev = [slice(None)] * e.ndim
+            prev[axis] = slice(e.shape[axis] - 1, e.shape[axis])
+            result[tuple(last)] = e[tuple(prev)]
+
+        e = result
+
+    return e
+
+
+def _vcycle(u, f, spacings, mask, shift):
+    if min(u.shape) <= 5:
+        _smooth(u, f, spacings, mask, shift, 50)
+        return
+
+    _smooth(u, f, spacings, mask, shift, 3)
+
+    r = _restrict(_residual(u, f, spacings, mask, shift))
+    coarseMask = mask[tuple(slice(None, None, 2) for _ in mask.shape)]
+    coarseMask = coarseMask & interiorMask(coarseMask.shape)
+    e = np.zeros(r.shape, dtype=u.dtype)
+    _vcycle(e, r, tuple(2 * h for h in spacings), coarseMask, shift)
+
+    u += np.where(mask, _prolong(e, u.shape), 0)
+    _smooth(u, f, spacings, mask, shift, 3)
+
+
+# splits a periodic (*shape, 3) component array into its curl free and
+# divergence free parts by projecting onto k in fourier space, the mean
+# flow goes to the divergence free part; k is the one of the spectral
+# derivatives, without the nyquist modes of even length axes, so the
+# parts are exact for those derivatives and modes with no k left (the
+# mean and the pure nyquist ones) are divergence free
+def periodicDecomposition(data, dist):
+    ndim = data.ndim - 1
+    shape = data.shape[:-1]
+    spacings = axisSpacings(ndim, dist)
+    k = [None if axis is None else spectral.derivativeFactor(shape, spacings, axis).imag
+         for axis in AXES[ndim]]
+
+    fhat = [np.fft.rfftn(data[..., comp]) for comp in range(3)]
+    knorm = sum(kc ** 2 for kc in k if kc is not None)
+    kdotf = sum(kc * fhat[comp] for comp, kc in enumerate(k) if kc is not None)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = kdotf / knorm
+    ratio[knorm == 0] = 0
+
+    curlFree = np.zeros(data.shape, dtype=floatType(data))
+    for comp, kc in enumerate(k):
+        if kc is not None:
+            curlFree[..., comp] = np.fft.irfftn(kc * ratio, s=shape)
+
+    return curlFree, data - curlFree
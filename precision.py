@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# fields hold float32 or float64 values; integer and boolean input is
+# promoted to float64 and any other type (float16, complex) is rejected.
+# Operators compute in the floating type of their input so a float32
+# field gives float32 gradients, curls, solutions and samples, and
+# arithmetic results take the precision of the field whose operator
+# runs, the left one when both sides are fields
+DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+# mixed precision keeps the fields as they are but accumulates
+# integrals and other reductions in float64, off by default
+_mixed = False
+
+
+def checkDtype(dtype):
+    dtype = np.dtype(dtype)
+    if dtype not in DTYPES:
+        raise ValueError(
+            "Unsupported field dtype {}, expected one of {}".format(dtype, tuple(str(d) for d in DTYPES)))
+    return dtype
+
+
+# floating dtype that results derived from the given arrays or dtypes
+# are computed in
+def floatType(*values):
+    dtype = np.result_type(*values)
+    if np.issubdtype(dtype, np.inexact):
+        return dtype
+    return np.dtype(np.float64)
+
+
+# dtype reductions over the given values accumulate in
+def accumulator(*values):
+    if _mixed:
+        return np.result_type(floatType(*values), np.float64)
+    return floatType(*values)
+
+
+def setMixed(enabled=True):
+    global _mixed
+    _mixed = enabled
+
+
+def isMixed():
+    return _mixed
+
+
+# mixed precision for the block, the previous setting is restored after
+@contextmanager
+def mixedPrecision(enabled=True):
+    previous = _mixed
+    setMixed(enabled)
+    try:
+        yield
+    finally:
+        setMixed(previous)
@@ -0,0 +1,266 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# opt in instrumentation of the hot paths; instrumented functions cost
+# one global lookup when it's off. When on, every call records its wall
+# time, the grid shape and the bytes of the result it returns (or the
+# tracemalloc peak above the start of the call with memory=True) under
+# the operation name, phase() blocks inside an operation add sub timers
+# to the innermost running operation, and with trace=True every call
+# and phase is kept as an event for exportTrace
+_enabled = False
+_trace = False
+_memory = False
+# tracemalloc is only stopped again when it was started here
+_startedTracing = False
+
+# reused for every phase() while profiling is off
+_NULL = nullcontext()
+
+
+class OpStats:
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.shapes = {}
+        self.phases = {}
+
+    def __repr__(self):
+        return "OpStats {} {} calls, {:.6f} s, {} bytes".format(
+            self.name, self.count, self.seconds, self.bytes)
+
+    def asDict(self):
+        return {
+            "count": self.count,
+            "seconds": self.seconds,
+            "bytes": self.bytes,
+            "shapes": {"x".join(str(n) for n in shape): count
+                       for shape, count in self.shapes.items()},
+            "phases": dict(self.phases),
+        }
+
+
+# everything recorded since the last reset, keyed by operation name
+class Stats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.ops = {}
+            self.events = []
+            self.start = time.perf_counter()
+
+    def __repr__(self):
+        return "Stats {} operations".format(len(self.ops))
+
+    def __getitem__(self, name):
+        return self.ops[name]
+
+    def __contains__(self, name):
+        return name in self.ops
+
+    def __iter__(self):
+        return iter(self.ops.values())
+
+    def _op(self, name):
+        op = self.ops.get(name)
+        if op is None:
+            op = self.ops[name] = OpStats(name)
+        return op
+
+    def record(self, name, start, seconds, nbytes, shape):
+        with self.lock:
+            op = self._op(name)
+            op.count += 1
+            op.seconds += seconds
+            op.bytes += nbytes
+            if shape is not None:
+                op.shapes[shape] = op.shapes.get(shape, 0) + 1
+            if _trace:
+                self._event(name, start, seconds, {"shape": shape, "bytes": nbytes})
+
+    def recordPhase(self, owner, name, start, seconds):
+        with self.lock:
+            if owner is not None:
+                phases = self._op(owner).phases
+                phases[name] = phases.get(name, 0.0) + seconds
+            if _trace:
+                self._event(name, start, seconds, {"operation": owner})
+
+    # chrome trace "complete" events in microseconds since the reset
+    def _event(self, name, start, seconds, args):
+        self.events.append({
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.start) * 1e6,
+            "dur": seconds * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+    def asDict(self):
+        with self.lock:
+            return {name: op.asDict() for name, op in self.ops.items()}
+
+    # one line per operation, slowest first
+    def report(self):
+        lines = ["{:<28} {:>8} {:>12} {:>14}".format("operation", "calls", "seconds", "bytes")]
+        for op in sorted(self.ops.values(), key=lambda op: -op.seconds):
+            lines.append("{:<28} {:>8} {:>12.6f} {:>14}".format(op.name, op.count, op.seconds, op.bytes))
+            for phase, seconds in sorted(op.phases.items(), key=lambda item: -item[1]):
+                lines.append("  {:<26} {:>8} {:>12.6f}".format(phase, "", seconds))
+        return "\n".join(lines)
+
+    # writes the recorded events in the chrome trace format, open it in
+    # chrome://tracing or perfetto
+    def exportTrace(self, filename):
+        with self.lock:
+            events = list(self.events)
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+STATS = Stats()
+
+# running operations per thread, the innermost one owns the phases
+_local = threading.local()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _configure(enabled, trace, memory):
+    global _enabled, _trace, _memory, _startedTracing
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _startedTracing = True
+    elif not memory and _startedTracing:
+        tracemalloc.stop()
+        _startedTracing = False
+    _enabled, _trace, _memory = enabled, trace, memory
+
+
+def enable(trace=False, memory=False):
+    _configure(True, trace, memory)
+
+
+def disable():
+    _configure(False, False, False)
+
+
+def isEnabled():
+    return _enabled
+
+
+# profiles the block and hands back the stats, the previous state is
+# restored afterwards
+@contextmanager
+def profile(trace=False, memory=False, reset=True):
+    previous = (_enabled, _trace, _memory)
+    if reset:
+        STATS.reset()
+    enable(trace, memory)
+    try:
+        yield STATS
+    finally:
+        _configure(*previous)
+
+
+# grid shape of a field, None for anything else
+def shapeOf(obj):
+    shape = getattr(obj, "shape", None)
+    if isinstance(shape, tuple):
+        return shape
+    field = getattr(obj, "field", None)
+    if hasattr(field, "shape") and hasattr(obj, "origin"):
+        return field.shape
+    return None
+
+
+def sizeOf(obj):
+    data = getattr(obj, "data", None)
+    if data is None:
+        data = getattr(obj, "_field", obj)
+    return getattr(data, "nbytes", 0)
+
+
+# records every call of the decorated function under name while
+# profiling is on
+def instrument(name):
+    def decorate(fun):
+        @functools.wraps(fun)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fun(*args, **kwargs)
+            return _call(name, fun, args, kwargs)
+        return wrapper
+    return decorate
+
+
+def _call(name, fun, args, kwargs):
+    stack = _stack()
+    frame = [name, 0, 0]
+    if _memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][2] = max(stack[-1][2], peak)
+        tracemalloc.reset_peak()
+        frame[1] = frame[2] = current
+
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        result = fun(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+
+    if _memory:
+        peak = max(frame[2], tracemalloc.get_traced_memory()[1])
+        nbytes = peak - frame[1]
+        if stack:
+            stack[-1][2] = max(stack[-1][2], peak)
+    else:
+        nbytes = sizeOf(result)
+
+    shape = shapeOf(result)
+    if not shape and args:
+        shape = shapeOf(args[0])
+
+    STATS.record(name, start, seconds, nbytes, shape)
+    return result
+
+
+# times a block as a sub phase of the running operation
+def phase(name):
+    if not _enabled:
+        return _NULL
+    return _phase(name)
+
+
+@contextmanager
+def _phase(name):
+    stack = _stack()
+    owner = stack[-1][0] if stack else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STATS.recordPhase(owner, name, start, time.perf_counter() - start)
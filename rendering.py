@@ -0,0 +1,286 @@
+import numpy as np
+from .differential import AXES
+from .precision import floatType
+
+
+# "points" draws every (kept) grid point, "slice" one grid plane of a 3d
+# field and "isosurface" the cells where the values (the magnitude for
+# vector fields) cross level, as a contour on 2d fields
+VIEWS = ("points", "slice", "isosurface")
+
+# grids with more points than the budget are thinned out: "stride" keeps
+# every n-th point along each axis, "mean" averages n**ndim blocks so
+# small features don't alias away
+LODS = ("stride", "mean")
+
+DEFAULT_BUDGET = 1 << 15
+
+# arrows in a slice beyond this just turn into noise
+SLICE_ARROWS = 1 << 10
+
+LABELS = ("x axis", "y axis", "z axis")
+
+
+def checkView(view):
+    if view not in VIEWS:
+        raise ValueError(
+            "Unknown view {}, expected one of {}".format(view, VIEWS))
+
+
+def checkLod(lod):
+    if lod not in LODS:
+        raise ValueError(
+            "Unknown level of detail {}, expected one of {}".format(lod, LODS))
+
+
+# world coordinates of the n points along direction along, ranges holds
+# an optional (start, stop) per direction that replaces the index
+def axisValues(n, along, origin, dist, ranges=()):
+    if along < len(ranges) and len(ranges[along]) != 0:
+        base = np.linspace(ranges[along][0], ranges[along][1], n)
+    else:
+        base = np.arange(n, dtype=float)
+
+    return base * dist[along] + origin[along]
+
+
+# smallest stride along every axis that brings the grid within budget
+def stride(shape, budget=DEFAULT_BUDGET):
+    size = int(np.prod(shape, dtype=np.int64))
+    step = max(1, int(np.ceil((size / max(budget, 1)) ** (1. / len(shape)))) - 1)
+
+    while np.prod([-(-n // step) for n in shape], dtype=np.int64) > budget:
+        step += 1
+
+    return step
+
+
+# thins values (*shape) or (*shape, C) and the per axis coordinates out
+# by step along the leading len(axes) axes
+def decimate(values, axes, step, lod="stride"):
+    checkLod(lod)
+    axes = list(axes)
+
+    if step == 1:
+        return np.asarray(values), axes
+
+    if lod == "stride":
+        index = tuple(slice(None, None, step) for _ in axes)
+        return np.asarray(values[index]), [a[::step] for a in axes]
+
+    values = np.asarray(values, dtype=floatType(values))
+    for axis in range(len(axes)):
+        n = values.shape[axis]
+        starts = np.arange(0, n, step)
+        counts = np.diff(np.append(starts, n))
+
+        view = [1] * values.ndim
+        view[axis] = len(starts)
+        values = np.add.reduceat(values, starts, axis=axis) / counts.reshape(view)
+        axes[axis] = np.add.reduceat(axes[axis], starts) / counts
+
+    return values, axes
+
+
+# decimated values and the (x, y, z) world coordinates of the kept
+# points as full grids, directions the field lacks are zero
+def prepare(values, ndim, origin, dist, ranges=(), budget=DEFAULT_BUDGET, lod="stride"):
+    shape = values.shape[:ndim]
+    axes = [None] * ndim
+    for along, axis in enumerate(AXES[ndim]):
+        if axis is not None:
+            axes[axis] = axisValues(shape[axis], along, origin, dist, ranges)
+
+    values, axes = decimate(values, axes, stride(shape, budget), lod)
+    grids = np.meshgrid(*axes, indexing="ij")
+
+    coords = tuple(np.zeros(grids[0].shape) if axis is None else grids[axis]
+                   for axis in AXES[ndim])
+    return coords, values
+
+
+# the plane at index (the middle by default) normal to direction along
+# of a 3d grid, returns the two in plane directions, their coordinate
+# grids and the decimated plane values
+def preparePlane(values, origin, dist, along=2, index=None, ranges=(), budget=DEFAULT_BUDGET, lod="stride"):
+    removed = AXES[3][along]
+    if index is None:
+        index = values.shape[removed] // 2
+
+    plane = np.take(values, index, axis=removed)
+    directions = [d for d in range(3) if d != along]
+
+    axes = [None, None]
+    for d in directions:
+        axis = AXES[3][d]
+        axis -= axis > removed
+        axes[axis] = axisValues(values.shape[AXES[3][d]], d, origin, dist, ranges)
+
+    plane, axes = decimate(plane, axes, stride(plane.shape[:2], budget), lod)
+    grids = np.meshgrid(*axes, indexing="ij")
+
+    coords = []
+    for d in directions:
+        axis = AXES[3][d]
+        coords.append(grids[axis - (axis > removed)])
+
+    return directions, coords, plane
+
+
+# indices of the grid points next to where values crosses level
+def crossings(values, level):
+    above = np.asarray(values) >= level
+    mask = np.zeros(above.shape, dtype=bool)
+
+    for axis in range(above.ndim):
+        lo = [slice(None)] * above.ndim
+        hi = [slice(None)] * above.ndim
+        lo[axis] = slice(None, -1)
+        hi[axis] = slice(1, None)
+        mask[tuple(lo)] |= above[tuple(lo)] != above[tuple(hi)]
+
+    return np.nonzero(mask)
+
+
+# (x, y, z) coordinates of at most budget points on the level set of a
+# 3d grid
+def prepareIsosurface(values, origin, dist, level=None, ranges=(), budget=DEFAULT_BUDGET):
+    if level is None:
+        level = float(np.mean(values))
+
+    index = crossings(values, level)
+    keep = max(1, -(-len(index[0]) // max(budget, 1)))
+    index = tuple(i[::keep] for i in index)
+
+    return tuple(axisValues(values.shape[axis], along, origin, dist, ranges)[index[axis]]
+                 for along, axis in enumerate(AXES[3]))
+
+
+# matplotlib is only imported by the first render, the numeric side of
+# the package never loads it
+def pyplot():
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# a pyplot figure when shown interactively, otherwise a bare Agg figure
+# that never touches the pyplot state so batch jobs can render any
+# number of frames on headless machines
+def figure(filename=None):
+    if filename is None:
+        return pyplot().figure()
+
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def finish(fig, ax, title, filename=None, dpi=100):
+    ax.set_title(title)
+    if filename is None:
+        pyplot().show()
+    else:
+        fig.savefig(filename, dpi=dpi)
+
+
+def axes3d(fig):
+    ax = fig.add_subplot(111, projection="3d")
+    ax.set_xlabel(LABELS[0])
+    ax.set_ylabel(LABELS[1])
+    ax.set_zlabel(LABELS[2])
+    return ax
+
+
+def axes2d(fig, directions=(0, 1)):
+    ax = fig.add_subplot(111)
+    ax.set_xlabel(LABELS[directions[0]])
+    ax.set_ylabel(LABELS[directions[1]])
+    return ax
+
+
+def renderScalar(values, origin, dist, view="points", ranges=(), along=2, index=None, level=None,
+                 budget=DEFAULT_BUDGET, lod="stride", title="Scalar Field", filename=None, dpi=100):
+    checkView(view)
+    ndim = values.ndim
+    fig = figure(filename)
+
+    if view == "slice" and ndim == 3:
+        directions, (u, v), plane = preparePlane(values, origin, dist, along, index, ranges, budget, lod)
+        ax = axes2d(fig, directions)
+        mesh = ax.pcolormesh(u, v, plane, shading="nearest")
+        fig.colorbar(mesh, ax=ax)
+
+    elif view == "isosurface" and ndim == 3:
+        ax = axes3d(fig)
+        ax.scatter(*prepareIsosurface(values, origin, dist, level, ranges, budget), s=1)
+
+    elif view == "isosurface" and ndim == 2:
+        (x, y, _), plane = prepare(values, 2, origin, dist, ranges, budget, lod)
+        ax = axes2d(fig)
+        ax.contour(x, y, plane, levels=[float(np.mean(plane)) if level is None else level])
+
+    elif ndim == 1:
+        (x, _, _), line = prepare(values, 1, origin, dist, ranges, budget, lod)
+        ax = axes2d(fig)
+        ax.plot(x, line)
+
+    elif ndim == 2:
+        (x, y, _), c = prepare(values, 2, origin, dist, ranges, budget, lod)
+        ax = axes2d(fig)
+        scatter = ax.scatter(x.ravel(), y.ravel(), c=c.ravel())
+        fig.colorbar(scatter, ax=ax)
+
+    else:
+        (x, y, z), c = prepare(values, 3, origin, dist, ranges, budget, lod)
+        ax = axes3d(fig)
+        scatter = ax.scatter(x.ravel(), y.ravel(), z.ravel(), c=c.ravel())
+        fig.colorbar(scatter, ax=ax)
+
+    finish(fig, ax, title, filename, dpi)
+    return fig
+
+
+# data is the (*grid, 3) component array, arrows are normalized to
+# scale; the slice view draws the in plane components colored by the
+# magnitude and the isosurface view the level set of the magnitude
+def renderVector(data, origin, dist, view="points", scale=0.2, ranges=(), along=2, index=None, level=None,
+                 budget=DEFAULT_BUDGET, lod="stride", title="Vector Field", filename=None, dpi=100):
+    checkView(view)
+    ndim = data.ndim - 1
+    fig = figure(filename)
+
+    if view == "slice" and ndim == 3:
+        directions, (u, v), plane = preparePlane(data, origin, dist, along, index, ranges,
+                                                 min(budget, SLICE_ARROWS), lod)
+        ax = axes2d(fig, directions)
+        arrows = ax.quiver(u, v, plane[..., directions[0]], plane[..., directions[1]],
+                           np.linalg.norm(plane, axis=-1))
+        fig.colorbar(arrows, ax=ax)
+
+    elif view == "isosurface" and ndim == 3:
+        ax = axes3d(fig)
+        magnitude = np.linalg.norm(data, axis=-1)
+        ax.scatter(*prepareIsosurface(magnitude, origin, dist, level, ranges, budget), s=1)
+
+    else:
+        (x, y, z), values = prepare(data, ndim, origin, dist, ranges, budget, lod)
+        ax = axes3d(fig)
+        ax.quiver(x, y, z, values[..., 0], values[..., 1], values[..., 2],
+                  length=1 * scale, normalize=True)
+
+    finish(fig, ax, title, filename, dpi)
+    return fig
+
+
+# paths is (steps + 1, M, 3) as returned by streamlines.integrate
+def renderPaths(paths, title="Vector Field", filename=None, dpi=100):
+    fig = figure(filename)
+    ax = axes3d(fig)
+    for seed in range(paths.shape[1]):
+        ax.plot(paths[:, seed, 0], paths[:, seed, 1], paths[:, seed, 2])
+
+    finish(fig, ax, title, filename, dpi)
+    return fig
@@ -0,0 +1,62 @@
+import itertools
+
+import numpy as np
+from .differential import AXES
+from .precision import floatType
+
+
+# nearest takes the closest grid value, trilinear blends the 2**ndim
+# surrounding grid values (bilinear / linear on 2d and 1d grids); points
+# outside the grid are clamped to its edges
+MODES = ("nearest", "trilinear")
+
+
+def checkMode(mode):
+    if mode not in MODES:
+        raise ValueError(
+            "Unknown sampling mode {}, expected one of {}".format(mode, MODES))
+
+
+# fractional array indices of world space points, points is (M, 3) or
+# (M, 2) of x, y, z coordinates, the result is (M, ndim) in array axis
+# order
+def gridCoordinates(points, ndim, origin, dist):
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    coords = np.empty((points.shape[0], ndim))
+
+    for along, axis in enumerate(AXES[ndim]):
+        if axis is not None:
+            if along >= points.shape[1]:
+                raise TypeError(
+                    "Expected points with at least {} coordinates, got {}".format(along + 1, points.shape[1]))
+            coords[:, axis] = (points[:, along] - origin[along]) / dist[along]
+
+    return coords
+
+
+# values is (*grid) or (*grid, C), returns (M,) or (M, C) in the
+# floating type of values
+def sample(values, coords, mode="trilinear"):
+    checkMode(mode)
+    shape = np.array(values.shape[:coords.shape[1]])
+
+    if mode == "nearest":
+        index = np.clip(np.rint(coords), 0, shape - 1).astype(np.intp)
+        return values[tuple(index.T)]
+
+    lower = np.clip(np.floor(coords), 0, np.maximum(shape - 2, 0)).astype(np.intp)
+    frac = np.clip(coords - lower, 0, 1)
+    upper = np.minimum(lower + 1, shape - 1)
+
+    result = 0
+    for corner in itertools.product((0, 1), repeat=coords.shape[1]):
+        corner = np.array(corner, dtype=bool)
+        index = np.where(corner, upper, lower)
+        weight = np.prod(np.where(corner, frac, 1 - frac), axis=1).astype(floatType(values), copy=False)
+
+        value = values[tuple(index.T)]
+        if value.ndim > 1:
+            weight = weight[:, np.newaxis]
+        result = result + weight * value
+
+    return result
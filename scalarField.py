@@ -1,201 +1,376 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from .vector import Vector
+from .fieldLoader import evaluateScalar, meshAxes
 from .vectorField import VectorField as vf
+from .differential import AXES, checkMethod, gradientInto
+from . import spectral
+from .spectral import axisSpacings
+from .slabs import defaultSlab, slabApply, workerSlab
+from .derivativeCache import DerivativeCache
+from .lazyField import LazyField
+from .poisson import solvePoisson
+from . import sampler
+from .sampler import gridCoordinates
+from .integrals import volumeIntegral
+from . import fieldIO
+from .profiling import instrument, phase
+from .precision import checkDtype, floatType
+from . import rendering
 
 
 class ScalarField:
 
-    def __init__(self, field, origin=[0, 0, 0], dist=[1, 1, 1]):
-        self.field = np.array(field)
+    # memory mapped arrays are kept as they are instead of being copied
+    # so fields larger than memory can be opened, copy=False wraps any
+    # array without copying it
+    # values are float32 or float64: dtype converts them, by default
+    # integer and boolean values become float64, see precision; every
+    # operator keeps that precision
+    def __init__(self, field, origin=[0, 0, 0], dist=[1, 1, 1], copy=True, dtype=None):
+        self.derivatives = DerivativeCache()
+        field = field if isinstance(field, np.ndarray) else np.asarray(field)
+        dtype = checkDtype(floatType(field) if dtype is None else dtype)
+
+        if isinstance(field, np.memmap) or not copy:
+            self.field = field.astype(dtype, copy=False)
+        else:
+            self.field = np.array(field, dtype=dtype)
         self.origin = origin
         self.dist = dist
 
+    # opens a raw array file on disk without reading it into memory
+    @classmethod
+    def fromMemmap(cls, filename, shape, dtype=np.float64, mode="r", offset=0, origin=[0, 0, 0], dist=[1, 1, 1]):
+        field = np.memmap(filename, dtype=dtype, mode=mode,
+                          offset=offset, shape=tuple(shape))
+        return cls(field, origin=origin, dist=dist)
+
+    # writes the raw field with origin and dist, see fieldIO for the
+    # formats; compression="zlib" compresses it chunk by chunk
+    def save(self, filename, compression=None, level=6, chunk=None):
+        fieldIO.save(filename, "scalar", self.field, self.origin, self.dist,
+                     compression=compression, level=level, chunk=chunk)
+
+    # mmap=True maps an uncompressed raw file instead of reading it
+    @classmethod
+    def load(cls, filename, mmap=False, mode="r"):
+        kind, field, origin, dist = fieldIO.load(filename, mmap=mmap, mode=mode)
+        fieldIO.checkKind(kind, "scalar")
+        return cls(field, origin=origin, dist=dist, copy=False)
+
+    # replacing the field drops every cached derivative, call invalidate
+    # after writing into field in place; new values follow the dtype
+    # policy of the constructor, float32 and float64 arrays are kept as
+    # they are
+    @property
+    def field(self):
+        return self._field
+
+    @field.setter
+    def field(self, field):
+        field = field if isinstance(field, np.ndarray) else np.asarray(field)
+        self._field = field.astype(checkDtype(floatType(field)), copy=False)
+        self.invalidate()
+
+    def invalidate(self):
+        self.derivatives.clear()
+
     def __str__(self):
         return "ScalarField {}".format(self.field.shape)
 
     def __repr__(self):
         return "ScalarField {}".format(self.field.shape)
 
-    def __add__(self, val):
+    # brings the other operand into something that broadcasts against
+    # field, vector and lazy operands are left to their own reflected
+    # methods
+    def _operand(self, val):
         if isinstance(val, ScalarField):
             if(self.field.shape != val.field.shape):
                 raise TypeError(
                     "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return ScalarField(self.field + val.field)
-        return ScalarField(self.field + val)
+            return val.field
+        return val
+
+    def _defers(self, val):
+        return isinstance(val, (vf, LazyField))
+
+    # results live on the same grid and in the precision of self
+    def _result(self, field):
+        return ScalarField(field, origin=self.origin, dist=self.dist, copy=False, dtype=self.field.dtype)
+
+    # updates field in place when the result type fits, otherwise the
+    # field is replaced as the plain operator would
+    @instrument("ScalarField.inplace")
+    def _inplace(self, op, val):
+        if self._defers(val):
+            return NotImplemented
+
+        val = self._operand(val)
+        try:
+            op(self.field, val, out=self.field)
+            self.invalidate()
+        except TypeError:
+            # numpy refuses to cast the result back, e.g. for complex
+            # values, which the field setter rejects
+            self.field = op(self.field, val)
+        return self
+
+    @instrument("ScalarField.add")
+    def __add__(self, val):
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.field + self._operand(val))
 
+    @instrument("ScalarField.sub")
     def __sub__(self, val):
-        if isinstance(val, ScalarField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return ScalarField(self.field - val.field)
-        return ScalarField(self.field - val)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.field - self._operand(val))
 
+    @instrument("ScalarField.mul")
     def __mul__(self, val):
-        if isinstance(val, ScalarField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return ScalarField(self.field * val.field)
-        return ScalarField(self.field * val)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.field * self._operand(val))
 
+    @instrument("ScalarField.pow")
     def __pow__(self, val):
-        if isinstance(val, ScalarField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return ScalarField(self.field ** val.field)
-        return ScalarField(self.field ** val)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.field ** self._operand(val))
 
+    @instrument("ScalarField.truediv")
     def __truediv__(self, val):
-        if isinstance(val, ScalarField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return ScalarField(self.field / val.field)
-        return ScalarField(self.field / val)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.field / self._operand(val))
 
+    @instrument("ScalarField.floordiv")
     def __floordiv__(self, val):
-        if isinstance(val, ScalarField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return ScalarField(self.field // val.field)
-        return ScalarField(self.field // val)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.field // self._operand(val))
+
+    def __iadd__(self, val):
+        return self._inplace(np.add, val)
+
+    def __isub__(self, val):
+        return self._inplace(np.subtract, val)
+
+    def __imul__(self, val):
+        return self._inplace(np.multiply, val)
+
+    def __ipow__(self, val):
+        return self._inplace(np.power, val)
+
+    def __itruediv__(self, val):
+        return self._inplace(np.true_divide, val)
+
+    def __ifloordiv__(self, val):
+        return self._inplace(np.floor_divide, val)
+
+    # records arithmetic into an expression that is evaluated in fused
+    # chunks, see lazyField
+    def lazy(self):
+        return LazyField.leaf(self)
+
+    # partial derivatives along x, y and z packed into an array backed
+    # VectorField, out may be a (*shape, 3) array or a VectorField whose
+    # buffer is reused so repeated gradients don't reallocate
+    # memory mapped fields (or any field when slab is given) are
+    # processed slab by slab, pass a memmap as out to stream the result
+    # to disk
+    # method="spectral" differentiates periodic fields through the fft
+    # workers > 1 splits the grid into that many slabs computed on a
+    # thread pool, the result matches the serial one exactly; spectral
+    # derivatives always run on the whole field
+    @instrument("ScalarField.gradient")
+    def gradient(self, out=None, slab=None, order=1, method="fd", workers=1):
+        checkMethod(method)
+        shape = self.field.shape + (3,)
+        result = out
+
+        if out is None:
+            out = np.empty(shape, dtype=floatType(self.field))
+        elif isinstance(out, vf):
+            out = out.data
+
+        if(out.shape != shape):
+            raise TypeError(
+                "Dimensions of the output buffer are different {}, {}".format(out.shape, shape))
+
+        if method == "spectral" and slab is not None:
+            raise ValueError(
+                "Spectral derivatives need the whole field, they can't be computed slab by slab")
+
+        if slab is None and method == "fd" and isinstance(self.field, np.memmap):
+            slab = defaultSlab(self.field.shape, self.field.itemsize)
+
+        if slab is None and method == "fd" and workers > 1:
+            slab = workerSlab(self.field.shape[0], workers)
+
+        # a caller supplied buffer is filled directly, skipping the cache
+        if slab is None:
+            self._gradient(self.field, out, order, method,
+                           cached=result is None)
+        else:
+            slabApply(lambda field: self._gradient(field, order=order, cached=False),
+                      self.field, out, slab, halo=order, workers=workers)
 
-    def gradient(self):
-        if(self.field.ndim == 2):
-            x = np.gradient(self.field, axis=0)
-            y = np.gradient(self.field, axis=1)
-
-            result = []
-
-            for loc, val in np.ndenumerate(x):
-                result.append(Vector(val, y[loc[0]][loc[1]]))
-
-            result = np.array(result)
-            result.resize(self.field.shape)
-
-            return vf(result)
-
-        elif(self.field.ndim == 3):
-            z = np.gradient(self.field, self.dist[2], axis=0)
-            x = np.gradient(self.field, self.dist[0], axis=1)
-            y = np.gradient(self.field, self.dist[1], axis=2)
-
-            result = []
-            for loc, val in np.ndenumerate(x):
-                result.append(
-                    Vector(val, y[loc[0]][loc[1]][loc[2]], z[loc[0]][loc[1]][loc[2]]))
-
-            result = np.array(result)
-            result.resize(self.field.shape)
-
-            return vf(result)
-
-    def show(self, x=(), y=(), z=(), title="Scalar Field"):
-        fig = plt.figure()
-        ranges = self.field.shape
-
-        # 2d field
-        if self.field.ndim == 2:
-            ax = fig.add_subplot(111)
-
-            x_axis = []
-            y_axis = []
-            c = []
-
-            for loc, val in np.ndenumerate(self.field):
-                if len(x) == 0 or len(y) == 0:
-                    x_axis.append(loc[0])
-                    y_axis.append(loc[1])
-                c.append(val)
-
-            if len(x) != 0 and len(y) != 0:
-                x_axis, y_axis = np.meshgrid(np.linspace(
-                    x[0], x[1], ranges[0]), np.linspace(y[0], y[1], ranges[1]))
-
-            x_axis = np.array([x*self.dist[0] + self.origin[0]
-                               for x in x_axis])
-            y_axis = np.array([y*self.dist[1] + self.origin[1]
-                               for y in y_axis])
-
-            scatter = ax.scatter(x_axis, y_axis, c=c)
-
-            # adding labels
-            plt.xlabel("x axis")
-            plt.ylabel("y axis")
-
-            # adding legend
-            plt.colorbar(scatter)
-            plt.title(title)
-            plt.show()
-
-        # 3d field
-        if(self.field.ndim == 3):
-            ax = fig.add_subplot(111, projection="3d")
-
-            x_axis = []
-            y_axis = []
-            z_axis = []
-            c = []
-
-            for loc, val in np.ndenumerate(self.field):
-                if len(x) == 0 or len(y) == 0 or len(z) == 0:
-                    z_axis.append(loc[0])
-                    x_axis.append(loc[1])
-                    y_axis.append(loc[2])
-                    c.append(val)
-
-            if len(x) != 0 and len(y) != 0 and len(z) != 0:
-                x_axis, y_axis, z_axis = np.meshgrid(
-                    np.linspace(z[0], z[1], ranges[0]),
-                    np.linspace(x[0], x[1], ranges[1]),
-                    np.linspace(y[0], y[1], ranges[2])
-                )
-
-            x_axis = np.array([x*self.dist[0] + self.origin[0]
-                               for x in x_axis])
-            y_axis = np.array([y*self.dist[1] + self.origin[1]
-                               for y in y_axis])
-            z_axis = np.array([z*self.dist[2] + self.origin[2]
-                               for z in z_axis])
-
-            scatter = ax.scatter(x_axis, y_axis, z_axis, c=c)
+        if isinstance(result, vf):
+            result.origin = self.origin
+            result.dist = self.dist
+            result.invalidate()
+            return result
 
-            # adding labels
-            ax.set_xlabel("x axis")
-            ax.set_ylabel("y axis")
-            ax.set_zlabel("z axis")
+        return vf(out, origin=self.origin, dist=self.dist, copy=False)
 
-            # adding legend
-            plt.colorbar(scatter)
-            plt.title(title)
-            plt.show()
+    # derivative along the direction along (0, 1, 2 for x, y, z), None
+    # when the field has no such axis
+    def partial(self, along, order=1, method="fd"):
+        checkMethod(method)
+        return self._partial(self.field, along, order, method)
+
+    # only derivatives of the field itself go through the cache
+    def _partial(self, field, along, order=1, method="fd"):
+        axis = AXES[field.ndim][along]
+        if axis is None:
+            return None
+
+        spacing = self.dist[along]
+        cached = field is self._field
+
+        if method == "spectral":
+            spacings = axisSpacings(field.ndim, self.dist)
+
+            def compute():
+                with phase("differentiate"):
+                    return spectral.derivative(field, spacings, axis, self._spectrum(field, cached))
+
+            order = "spectral"
+        else:
+            def compute():
+                with phase("differentiate"):
+                    return gradientInto(field, spacing, axis, order=order)
+
+        if not cached:
+            return compute()
+
+        return self.derivatives.get((None, axis, spacing, order), compute)
+
+    # the rfftn of the field, shared by all its spectral derivatives
+    def _spectrum(self, field, cached=True):
+        if not cached:
+            return spectral.spectrum(field)
+        return self.derivatives.get((None, None, None, "rfftn"), lambda: spectral.spectrum(field))
+
+    def _gradient(self, field, out=None, order=1, method="fd", cached=True):
+        if out is None:
+            out = np.empty(field.shape + (3,),
+                           dtype=floatType(field))
+
+        for comp, axis in enumerate(AXES[field.ndim]):
+            if axis is None:
+                out[..., comp] = 0
+            elif cached or method == "spectral":
+                out[..., comp] = self._partial(field, comp, order, method)
+            else:
+                with phase("differentiate"):
+                    gradientInto(field, self.dist[comp], axis,
+                                 out[..., comp], order=order)
+
+        return out
+
+    # sum of the second derivatives along each axis, the finite
+    # difference version differentiates the cached first derivatives
+    # again
+    @instrument("ScalarField.laplacian")
+    def laplacian(self, order=1, method="fd"):
+        checkMethod(method)
+
+        if method == "spectral":
+            spacings = axisSpacings(self.field.ndim, self.dist)
+            field = spectral.laplacian(self.field, spacings, self._spectrum(self.field))
+        else:
+            field = np.zeros(self.field.shape, dtype=floatType(self.field))
+            for along, axis in enumerate(AXES[self.field.ndim]):
+                if axis is not None:
+                    field += gradientInto(self._partial(self.field, along, order),
+                                          self.dist[along], axis, order=order)
+
+        return ScalarField(field, origin=self.origin, dist=self.dist, copy=False)
+
+    # integral over the whole grid, rule is "trapezoid" or "simpson"
+    def integrate(self, rule="trapezoid"):
+        return volumeIntegral(self.field, self.field.ndim, self.dist, rule)
+
+    # interpolated values at an (M, 3) array of world space points
+    def sample(self, points, mode="trilinear"):
+        coords = gridCoordinates(points, self.field.ndim, self.origin, self.dist)
+        return sampler.sample(self.field, coords, mode)
+
+    # (M, 3) gradient at the points, interpolated from the cached partial
+    # derivatives so repeated probes don't differentiate again
+    def sampleGradient(self, points, mode="trilinear", order=1, method="fd"):
+        checkMethod(method)
+        coords = gridCoordinates(points, self.field.ndim, self.origin, self.dist)
+        result = np.zeros((coords.shape[0], 3), dtype=floatType(self.field))
+
+        for along in range(3):
+            partial = self._partial(self.field, along, order, method)
+            if partial is not None:
+                result[:, along] = sampler.sample(partial, coords, mode)
+
+        return result
+
+    # the potential phi with laplacian(phi) - shift * phi = field, see
+    # poisson.solvePoisson for the boundary options
+    def solvePoisson(self, boundary="periodic", values=None, mask=None, shift=0.0,
+                     method="auto", tol=1e-10, maxCycles=200):
+        if isinstance(values, ScalarField):
+            values = values.field
+
+        phi = solvePoisson(self.field, self.dist, boundary=boundary, values=values, mask=mask,
+                           shift=shift, method=method, tol=tol, maxCycles=maxCycles)
+        return ScalarField(phi, origin=self.origin, dist=self.dist, copy=False)
+
+    # x, y, z are optional (start, stop) ranges replacing the grid index
+    # along each direction; grids over budget points are decimated by
+    # stride or block mean (lod), view="slice" draws the plane at index
+    # normal to along and view="isosurface" the points where the field
+    # crosses level; with a filename the figure is rendered off screen
+    # into the file instead of being shown, see rendering
+    @instrument("ScalarField.show")
+    def show(self, x=(), y=(), z=(), title="Scalar Field", view="points", along=2, index=None,
+             level=None, budget=rendering.DEFAULT_BUDGET, lod="stride", filename=None, dpi=100):
+        with phase("render"):
+            return rendering.renderScalar(self.field, self.origin, self.dist, view=view, ranges=(x, y, z),
+                                          along=along, index=index, level=level, budget=budget, lod=lod,
+                                          title=title, filename=filename, dpi=dpi)
 
     # here origin defines where all the user axes starts
     # fun takes in the location and gives the resultant
     # value / scalar at that location
     # x, y, z represents the axes generated using meshgrid
+    # mode="vectorized" passes the whole meshgrid arrays to fun in one
+    # call, see fieldLoader for what fun has to return in each mode
+    # mode="parallel" calls fun per point on a pool of the given number
+    # of workers, chunksize is in grid points; the default process pool
+    # is what speeds up pure python fun, which holds the GIL, a fun that
+    # can't be pickled (lambdas, closures) runs on threads instead, see
+    # fieldLoader.evaluateParallel
     @classmethod
-    def loadField(cls, origin, fun, x, y, z=[], dist=[1, 1, 1]):
-        field = []
-
-        if len(z) == 0:
-            for loc, _x in np.ndenumerate(np.array(x)):
-                _y = y[loc[0]][loc[1]]
-                field.append(fun((_x, _y)))
-        else:
-            for loc, _x in np.ndenumerate(np.array(x)):
-                _y = y[loc[0]][loc[1]][loc[2]]
-                _z = y[loc[0]][loc[1]][loc[2]]
-                field.append(fun((_x, _y, _z)))
+    @instrument("ScalarField.loadField")
+    def loadField(cls, origin, fun, x, y, z=[], dist=[1, 1, 1], mode="pointwise",
+                  workers=None, chunksize=None, executor="process", dtype=None):
+        if dtype is not None:
+            dtype = checkDtype(dtype)
 
-        field = np.array(field).reshape(np.array(x).shape)
+        with phase("evaluate"):
+            field = evaluateScalar(fun, meshAxes(x, y, z), mode, dtype=dtype, workers=workers,
+                                   chunksize=chunksize, executor=executor)
 
         if(len(origin) == 2):
             origin.append(0)
 
-        return ScalarField(field, origin=origin, dist=dist)
+        return ScalarField(field, origin=origin, dist=dist, copy=False)
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+# rows along the first axis per slab so that one slab of the source
+# stays around budget bytes
+def defaultSlab(shape, itemsize, budget=64 * 2**20):
+    row = itemsize * int(np.prod(shape[1:], dtype=np.int64))
+    return max(1, budget // max(row, 1))
+
+
+# rows per slab that give each of the workers one slab
+def workerSlab(n, workers):
+    return max(1, -(-n // workers))
+
+
+def slabRanges(n, slab):
+    for start in range(0, n, slab):
+        yield start, min(start + slab, n)
+
+
+# the source rows [lo, hi) needed to compute rows [start, stop) with a
+# halo of the given width, clipped to the grid
+def haloRange(start, stop, n, halo=1):
+    return max(start - halo, 0), min(stop + halo, n)
+
+
+# applies op, a radius one stencil operator like np.gradient, slab by
+# slab along the first axis; each slab is read with a one cell halo on
+# both sides so the central differences at the seams are the same as
+# on the whole grid, and only the slab rows are written into out; second
+# order edges need a halo of two so the slabs next to the grid edges
+# always hold the three rows the one sided stencil reads
+# with workers > 1 the slabs run on a thread pool, numpy drops the GIL
+# inside the stencils and every slab writes its own rows of out, so the
+# result is the same as the serial one
+def slabApply(op, source, out, slab, halo=1, workers=1):
+    n = source.shape[0]
+
+    def run(start, stop):
+        lo, hi = haloRange(start, stop, n, halo)
+        result = op(np.asarray(source[lo:hi]))
+        out[start:stop] = result[start - lo:stop - lo]
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(run, start, stop) for start, stop in slabRanges(n, slab)]:
+                future.result()
+    else:
+        for start, stop in slabRanges(n, slab):
+            run(start, stop)
+
+    if isinstance(out, np.memmap):
+        out.flush()
+
+    return out
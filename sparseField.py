@@ -0,0 +1,351 @@
+import itertools
+
+import numpy as np
+from .vector import Vector
+from .scalarField import ScalarField
+from .vectorField import VectorField, CURL_TERMS
+from .differential import AXES, gradientInto
+from .precision import checkDtype, floatType
+
+
+# edge length of the tiles along every axis
+TILE = 16
+
+UFUNCS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "pow": np.power,
+    "truediv": np.true_divide,
+    "floordiv": np.floor_divide,
+}
+
+
+# a scalar or vector field over a grid of the given shape that only
+# stores the tiles somebody wrote into, tiles are dense blocks of tile
+# points per axis (smaller at the far edges of the grid) kept in a dict
+# by tile index and every point outside them has the background value;
+# arithmetic and the differential operators only visit stored tiles
+# and, for derivatives, the tiles the stencil reaches along each axis,
+# so the cost follows the occupied volume rather than the bounding box
+class SparseField:
+
+    def __init__(self, shape, tile=TILE, background=0.0, vector=False,
+                 origin=[0, 0, 0], dist=[1, 1, 1], dtype=np.float64):
+        self.shape = tuple(shape)
+        self.tile = (tile,) * len(self.shape) if np.isscalar(tile) else tuple(tile)
+        self.vector = vector
+        self.origin = origin
+        self.dist = dist
+        self.dtype = checkDtype(dtype)
+        self.background = np.asarray(background, dtype=self.dtype)
+        if vector:
+            self.background = np.broadcast_to(self.background, (3,)).copy()
+        self.tiles = {}
+
+    def __repr__(self):
+        return "SparseField {} ({} of {} tiles)".format(self.shape, len(self.tiles), self.tileCount)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __len__(self):
+        return len(self.tiles)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    # number of tiles along each axis and in the whole grid
+    @property
+    def tileGrid(self):
+        return tuple(-(-n // t) for n, t in zip(self.shape, self.tile))
+
+    @property
+    def tileCount(self):
+        return int(np.prod(self.tileGrid, dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.tiles.values())
+
+    def tileSlices(self, index):
+        return tuple(slice(i * t, min((i + 1) * t, n))
+                     for i, t, n in zip(index, self.tile, self.shape))
+
+    def tileShape(self, index):
+        shape = tuple(s.stop - s.start for s in self.tileSlices(index))
+        return shape + (3,) if self.vector else shape
+
+    # the values of a tile, a background filled one when it isn't stored;
+    # create=True stores that so it can be written into
+    def getTile(self, index, create=False):
+        values = self.tiles.get(index)
+        if values is None:
+            values = np.empty(self.tileShape(index), dtype=self.dtype)
+            values[...] = self.background
+            if create:
+                self.tiles[index] = values
+        return values
+
+    def setTile(self, index, values):
+        values = np.asarray(values, dtype=self.dtype)
+        if values.shape != self.tileShape(index):
+            raise TypeError(
+                "Dimensions of the arguments are different {}, {}".format(values.shape, self.tileShape(index)))
+        self.tiles[index] = values
+
+    # tile indices in the box of grid indices [lo, hi)
+    def tilesIn(self, lo, hi):
+        ranges = [range(l // t, -(-h // t)) for l, h, t in zip(lo, hi, self.tile)]
+        return itertools.product(*ranges)
+
+    # writes a dense block of values with its first point at the grid
+    # index start, the tiles it touches are created as needed
+    def write(self, start, values):
+        values = np.asarray(values)
+        stop = tuple(s + n for s, n in zip(start, values.shape[:self.ndim]))
+
+        for index in self.tilesIn(start, stop):
+            tile = self.getTile(index, create=True)
+            slices = self.tileSlices(index)
+            lo = [max(s.start, a) for s, a in zip(slices, start)]
+            hi = [min(s.stop, b) for s, b in zip(slices, stop)]
+            tile[tuple(slice(l - s.start, h - s.start) for l, h, s in zip(lo, hi, slices))] = \
+                values[tuple(slice(l - a, h - a) for l, h, a in zip(lo, hi, start))]
+
+    # dense copy of the grid box [lo, hi) assembled from the tiles
+    def gather(self, lo, hi):
+        shape = tuple(h - l for l, h in zip(lo, hi))
+        out = np.empty(shape + (3,) if self.vector else shape, dtype=self.dtype)
+        out[...] = self.background
+
+        for index in self.tilesIn(lo, hi):
+            values = self.tiles.get(index)
+            if values is None:
+                continue
+            slices = self.tileSlices(index)
+            a = [max(s.start, l) for s, l in zip(slices, lo)]
+            b = [min(s.stop, h) for s, h in zip(slices, hi)]
+            out[tuple(slice(i - l, j - l) for i, j, l in zip(a, b, lo))] = \
+                values[tuple(slice(i - s.start, j - s.start) for i, j, s in zip(a, b, slices))]
+
+        return out
+
+    # drops the tiles whose values are all within tol of the background
+    def prune(self, tol=0.0):
+        for index in list(self.tiles):
+            if np.all(np.abs(self.tiles[index] - self.background) <= tol):
+                del self.tiles[index]
+        return self
+
+    # tiles of a ScalarField or VectorField with any value further than
+    # tol from the background are stored
+    @classmethod
+    def fromDense(cls, field, tile=TILE, background=0.0, tol=0.0):
+        vector = isinstance(field, VectorField)
+        values = field.data if vector else field.field
+
+        result = cls(values.shape[:values.ndim - vector], tile, background, vector,
+                     field.origin, field.dist, floatType(values))
+        for index in itertools.product(*(range(n) for n in result.tileGrid)):
+            block = values[result.tileSlices(index)]
+            if np.any(np.abs(block - result.background) > tol):
+                result.tiles[index] = np.array(block, dtype=result.dtype)
+
+        return result
+
+    def toDense(self):
+        values = self.gather((0,) * self.ndim, self.shape)
+        if self.vector:
+            return VectorField(values, origin=self.origin, dist=self.dist, copy=False)
+        return ScalarField(values, origin=self.origin, dist=self.dist, copy=False)
+
+    def _like(self, vector, background, dtype):
+        return SparseField(self.shape, self.tile, background, vector, self.origin, self.dist, dtype)
+
+    # brings a tile (or the background) of an operand into a shape that
+    # broadcasts against the result, scalar values gain a component axis
+    # when the result is a vector
+    @staticmethod
+    def _expand(values, vector, isVector):
+        values = np.asarray(values)
+        if vector and not isVector and values.ndim > 0:
+            return values[..., np.newaxis]
+        return values
+
+    # applies op tile by tile, tiles stored on either side are computed
+    # and the backgrounds give the new background
+    def _binary(self, name, val, reflected=False):
+        if isinstance(val, SparseField):
+            if(self.shape != val.shape or self.tile != val.tile):
+                raise TypeError(
+                    "Dimensions of the arguments are different {}, {}".format(self.shape, val.shape))
+            other = val
+        elif isinstance(val, Vector):
+            other = np.array([val.x, val.y, val.z], dtype=self.dtype)
+        elif isinstance(val, (int, float, complex, np.number)) or (isinstance(val, np.ndarray) and val.shape in ((), (3,))):
+            other = val
+        else:
+            return NotImplemented
+
+        sparse = isinstance(other, SparseField)
+        otherVector = other.vector if sparse else np.shape(other) == (3,)
+
+        a, b = (other, self) if reflected else (self, other)
+        aVector, bVector = (otherVector, self.vector) if reflected else (self.vector, otherVector)
+
+        if aVector and bVector and name == "mul":
+            vector = False
+
+            def op(x, y):
+                return np.einsum("...i,...i->...", *np.broadcast_arrays(x, y))
+        elif aVector and bVector and name == "pow":
+            vector = True
+
+            def op(x, y):
+                return np.cross(*np.broadcast_arrays(x, y))
+        else:
+            vector = aVector or bVector
+
+            def op(x, y):
+                return UFUNCS[name](self._expand(x, vector, aVector), self._expand(y, vector, bVector))
+
+        def parts(operand, index):
+            if isinstance(operand, SparseField):
+                if index is None:
+                    return operand.background
+                return operand.tiles.get(index, operand.background)
+            return operand
+
+        background = op(parts(a, None), parts(b, None))
+        result = self._like(vector, background, background.dtype)
+
+        keys = set(self.tiles)
+        if sparse:
+            keys |= set(other.tiles)
+
+        for index in keys:
+            values = op(parts(a, index), parts(b, index))
+            result.tiles[index] = np.array(np.broadcast_to(values, result.tileShape(index)), dtype=result.dtype)
+
+        return result
+
+    def __add__(self, val):
+        return self._binary("add", val)
+
+    def __radd__(self, val):
+        return self._binary("add", val, True)
+
+    def __sub__(self, val):
+        return self._binary("sub", val)
+
+    def __rsub__(self, val):
+        return self._binary("sub", val, True)
+
+    def __mul__(self, val):
+        return self._binary("mul", val)
+
+    def __rmul__(self, val):
+        return self._binary("mul", val, True)
+
+    def __pow__(self, val):
+        return self._binary("pow", val)
+
+    def __rpow__(self, val):
+        return self._binary("pow", val, True)
+
+    def __truediv__(self, val):
+        return self._binary("truediv", val)
+
+    def __rtruediv__(self, val):
+        return self._binary("truediv", val, True)
+
+    def __floordiv__(self, val):
+        return self._binary("floordiv", val)
+
+    def __rfloordiv__(self, val):
+        return self._binary("floordiv", val, True)
+
+    def __neg__(self):
+        return self._binary("mul", -1)
+
+    # stored tiles and the tiles up to order points away from them along
+    # an axis, the only ones the stencils of that order (the one sided
+    # edge ones reach order points inward) can give non zero derivatives
+    # in
+    def _stencilTiles(self, order=1):
+        grid = self.tileGrid
+        tiles = set(self.tiles)
+        for index in self.tiles:
+            for axis in range(self.ndim):
+                reach = -(-order // self.tile[axis])
+                for step in range(-reach, reach + 1):
+                    neighbour = list(index)
+                    neighbour[axis] += step
+                    if step != 0 and 0 <= neighbour[axis] < grid[axis]:
+                        tiles.add(tuple(neighbour))
+        return tiles
+
+    # runs op(block, crop) on every stencil tile, block holds the tile
+    # with a halo of order points (clipped to the grid) so the edge
+    # stencils are the ones of the dense field, crop cuts the tile back
+    # out; the derivatives of the background are zero
+    def _stencil(self, op, vector, order=1):
+        result = self._like(vector, 0.0, floatType(self.dtype))
+
+        for index in self._stencilTiles(order):
+            slices = self.tileSlices(index)
+            lo = tuple(max(s.start - order, 0) for s in slices)
+            hi = tuple(min(s.stop + order, n) for s, n in zip(slices, self.shape))
+            crop = tuple(slice(s.start - l, s.stop - l) for s, l in zip(slices, lo))
+
+            result.tiles[index] = op(self.gather(lo, hi), crop)
+
+        return result
+
+    def _partial(self, block, crop, comp, along, order):
+        axis = AXES[self.ndim][along]
+        values = block if comp is None else block[..., comp]
+        return gradientInto(values, self.dist[along], axis, order=order)[crop]
+
+    def gradient(self, order=1):
+        if self.vector:
+            raise TypeError("The gradient is only defined for scalar fields")
+
+        def op(block, crop):
+            out = np.zeros(tuple(s.stop - s.start for s in crop) + (3,), dtype=floatType(block))
+            for along, axis in enumerate(AXES[self.ndim]):
+                if axis is not None:
+                    out[..., along] = self._partial(block, crop, None, along, order)
+            return out
+
+        return self._stencil(op, True, order)
+
+    def divergence(self, order=1):
+        if not self.vector:
+            raise TypeError("The divergence is only defined for vector fields")
+
+        def op(block, crop):
+            out = np.zeros(tuple(s.stop - s.start for s in crop), dtype=floatType(block))
+            for comp, axis in enumerate(AXES[self.ndim]):
+                if axis is not None:
+                    out += self._partial(block, crop, comp, comp, order)
+            return out
+
+        return self._stencil(op, False, order)
+
+    def curl(self, order=1):
+        if not self.vector:
+            raise TypeError("The curl is only defined for vector fields")
+
+        def op(block, crop):
+            out = np.zeros(tuple(s.stop - s.start for s in crop) + (3,), dtype=floatType(block))
+            for comp, (plus, minus) in enumerate(CURL_TERMS):
+                if AXES[self.ndim][plus[1]] is not None:
+                    out[..., comp] += self._partial(block, crop, *plus, order)
+                if AXES[self.ndim][minus[1]] is not None:
+                    out[..., comp] -= self._partial(block, crop, *minus, order)
+            return out
+
+        return self._stencil(op, True, order)
@@ -0,0 +1,85 @@
+from functools import lru_cache
+
+import numpy as np
+from .differential import AXES
+from .precision import floatType
+
+
+# spectral derivatives treat the field as periodic with period
+# shape[axis] * spacing, i.e. the grid must not repeat its first point
+# at the far end
+
+# spacing of each grid axis (in array order) from the per direction dist
+def axisSpacings(ndim, dist):
+    spacings = [1.0] * ndim
+    for along, axis in enumerate(AXES[ndim]):
+        if axis is not None:
+            spacings[axis] = float(dist[along])
+    return tuple(spacings)
+
+
+# angular wavenumbers for the rfftn layout of a grid, one array per axis
+# shaped to broadcast against the spectrum; cached so repeated calls on
+# grids of the same shape and spacing skip the setup
+@lru_cache(maxsize=32)
+def wavenumbers(shape, spacings):
+    ks = []
+    for axis, (n, d) in enumerate(zip(shape, spacings)):
+        if axis == len(shape) - 1:
+            k = 2 * np.pi * np.fft.rfftfreq(n, d)
+        else:
+            k = 2 * np.pi * np.fft.fftfreq(n, d)
+
+        view = [1] * len(shape)
+        view[axis] = k.size
+        k = k.reshape(view)
+        k.setflags(write=False)
+        ks.append(k)
+
+    return tuple(ks)
+
+
+# i * k along one axis with the nyquist mode of even length axes removed,
+# that mode has no well defined odd derivative on a real field
+@lru_cache(maxsize=32)
+def derivativeFactor(shape, spacings, axis):
+    k = wavenumbers(shape, spacings)[axis].copy()
+    n = shape[axis]
+
+    if n % 2 == 0:
+        index = [0] * len(shape)
+        index[axis] = n // 2
+        k[tuple(index)] = 0
+
+    factor = 1j * k
+    factor.setflags(write=False)
+    return factor
+
+
+@lru_cache(maxsize=32)
+def laplacianFactor(shape, spacings):
+    factor = -sum(k ** 2 for k in wavenumbers(shape, spacings))
+    factor.setflags(write=False)
+    return factor
+
+
+def spectrum(f):
+    return np.fft.rfftn(f)
+
+
+def derivative(f, spacings, axis, fhat=None):
+    f = np.asarray(f)
+    if fhat is None:
+        fhat = spectrum(f)
+
+    result = np.fft.irfftn(fhat * derivativeFactor(f.shape, spacings, axis), s=f.shape)
+    return result.astype(floatType(f), copy=False)
+
+
+def laplacian(f, spacings, fhat=None):
+    f = np.asarray(f)
+    if fhat is None:
+        fhat = spectrum(f)
+
+    result = np.fft.irfftn(fhat * laplacianFactor(f.shape, spacings), s=f.shape)
+    return result.astype(floatType(f), copy=False)
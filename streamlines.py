@@ -0,0 +1,155 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from .differential import AXES
+
+
+METHODS = ("rk4", "rk45")
+
+# dormand prince coefficients for the adaptive rk45 integrator
+DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+DP_B5 = (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0)
+DP_B4 = (5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40)
+
+
+# world space box covered by the grid, directions the grid lacks are
+# unbounded
+def bounds(field):
+    lo = np.full(3, -np.inf)
+    hi = np.full(3, np.inf)
+
+    for along, axis in enumerate(AXES[field.ndim]):
+        if axis is not None:
+            lo[along] = field.origin[along]
+            hi[along] = field.origin[along] + (field.shape[axis] - 1) * field.dist[along]
+
+    return lo, hi
+
+
+# traces all seeds through the field at once; paths is (steps + 1, M, 3)
+# with NaN after a seed stops, counts holds the number of valid points
+# per seed. A seed stops when it leaves the grid, its speed drops below
+# minSpeed or terminate(points) (an (M,) bool mask) says so; alive
+# can mark seeds that shouldn't move at all. rk4 takes fixed steps of
+# size step, rk45 adapts the step per seed to keep the local error
+# below tol and records every accepted step. workers > 1 splits the
+# seeds over a thread pool, the result is the same as with one worker
+def integrate(field, seeds, step, steps=100, method="rk4", out=None, alive=None, tol=1e-6,
+              minSpeed=0.0, terminate=None, workers=1, mode="trilinear", direction=1.0):
+    if method not in METHODS:
+        raise ValueError(
+            "Unknown integrator {}, expected one of {}".format(method, METHODS))
+
+    seeds = np.atleast_2d(np.asarray(seeds, dtype=float))
+    if seeds.shape[1] == 2:
+        seeds = np.concatenate((seeds, np.zeros((len(seeds), 1))), axis=1)
+
+    count = len(seeds)
+    shape = (steps + 1, count, 3)
+
+    if out is None:
+        out = np.empty(shape)
+    if(out.shape != shape):
+        raise TypeError(
+            "Dimensions of the output buffer are different {}, {}".format(out.shape, shape))
+
+    alive = np.ones(count, dtype=bool) if alive is None else np.array(alive, dtype=bool)
+    counts = np.zeros(count, dtype=np.intp)
+
+    def run(group):
+        _integrate(field, seeds[group], step * direction, steps, method, out[:, group],
+                   alive[group], counts[group], tol, minSpeed, terminate, mode)
+
+    if workers > 1 and count > 1:
+        groups = np.array_split(np.arange(count), workers)
+        slices = [slice(group[0], group[-1] + 1) for group in groups if len(group)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(run, group) for group in slices]:
+                future.result()
+    else:
+        run(slice(None))
+
+    return out, counts
+
+
+def _integrate(field, seeds, h, steps, method, out, alive, counts, tol, minSpeed, terminate, mode):
+    lo, hi = bounds(field)
+
+    def velocity(points):
+        return field.sample(points, mode)
+
+    def stillAlive(points):
+        keep = np.all((points >= lo) & (points <= hi), axis=1)
+        if minSpeed > 0:
+            keep &= np.linalg.norm(velocity(points), axis=1) >= minSpeed
+        if terminate is not None:
+            keep &= ~np.asarray(terminate(points), dtype=bool)
+        return keep
+
+    out[...] = np.nan
+    out[0] = seeds
+    alive &= stillAlive(seeds)
+    counts[...] = 1
+    points = seeds.copy()
+
+    if method == "rk4":
+        for n in range(1, steps + 1):
+            index = np.flatnonzero(alive)
+            if index.size == 0:
+                break
+
+            p = points[index]
+            k1 = velocity(p)
+            k2 = velocity(p + 0.5 * h * k1)
+            k3 = velocity(p + 0.5 * h * k2)
+            k4 = velocity(p + h * k3)
+            p = p + (h / 6) * (k1 + 2 * k2 + 2 * k3 + k4)
+
+            keep = stillAlive(p)
+            alive[index[~keep]] = False
+            index, p = index[keep], p[keep]
+
+            points[index] = p
+            out[n, index] = p
+            counts[index] += 1
+        return
+
+    # rk45, every seed keeps its own step size and output slot
+    hs = np.full(len(seeds), float(h))
+    for _ in range(20 * steps):
+        index = np.flatnonzero(alive & (counts <= steps))
+        if index.size == 0:
+            break
+
+        p = points[index]
+        dt = hs[index][:, np.newaxis]
+        ks = []
+        for stage in range(7):
+            offset = sum(a * k for a, k in zip(DP_A[stage], ks)) if stage else 0
+            ks.append(velocity(p + dt * offset))
+
+        p5 = p + dt * sum(b * k for b, k in zip(DP_B5, ks))
+        p4 = p + dt * sum(b * k for b, k in zip(DP_B4, ks))
+        error = np.linalg.norm(p5 - p4, axis=1)
+
+        accept = error <= tol
+        # standard step size controller, bounded to a factor of 5 either way
+        factor = 0.9 * (tol / np.maximum(error, 1e-300)) ** 0.2
+        hs[index] *= np.clip(factor, 0.2, 5.0)
+
+        index, p5 = index[accept], p5[accept]
+        keep = stillAlive(p5)
+        alive[index[~keep]] = False
+        index, p5 = index[keep], p5[keep]
+
+        points[index] = p5
+        out[counts[index], index] = p5
+        counts[index] += 1
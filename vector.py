@@ -1,14 +1,33 @@
+import math
+import numbers
 import numpy as np
 
 
+# operands that are combined with a Vector through numpy, anything else
+# that isn't a Vector or a plain number is left to the other operand's
+# reflected method (VectorArray, VectorField, ...)
+_ARRAY_LIKE = (list, tuple, np.ndarray)
+
+# int and float are listed first so the common case skips the slower
+# abstract base class check
+_NUMBER = (int, float, numbers.Number)
+
+
 class Vector:
 
+    # no __dict__ and no backing ndarray, fields hold millions of these
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x, y, z=0):
-        self.coordinates = np.array([x, y, z])
         self.x = x
         self.y = y
         self.z = z
 
+    # kept for callers that still use the array form, built on access
+    @property
+    def coordinates(self):
+        return np.array([self.x, self.y, self.z])
+
     def __str__(self):
         return "Vector [{}, {}, {}]".format(self.x, self.y, self.z)
 
@@ -17,30 +36,60 @@ class Vector:
 
     def __add__(self, vec):
         if(isinstance(vec, Vector)):
-            return Vector(*(self.coordinates + vec.coordinates))
-        return Vector(*(self.coordinates + vec))
+            return Vector(self.x + vec.x, self.y + vec.y, self.z + vec.z)
+        if(isinstance(vec, _NUMBER)):
+            return Vector(self.x + vec, self.y + vec, self.z + vec)
+        if(isinstance(vec, _ARRAY_LIKE)):
+            return Vector(*(self.coordinates + vec))
+        return NotImplemented
 
     def __sub__(self, vec):
         if(isinstance(vec, Vector)):
-            return Vector(*(self.coordinates - vec.coordinates))
-        return Vector(*(self.coordinates - vec))
+            return Vector(self.x - vec.x, self.y - vec.y, self.z - vec.z)
+        if(isinstance(vec, _NUMBER)):
+            return Vector(self.x - vec, self.y - vec, self.z - vec)
+        if(isinstance(vec, _ARRAY_LIKE)):
+            return Vector(*(self.coordinates - vec))
+        return NotImplemented
 
     def __mul__(self, vec):
         if(isinstance(vec, Vector)):
-            return np.dot(self.coordinates, vec.coordinates)
-        return Vector(*(self.coordinates * vec))
+            return self.x * vec.x + self.y * vec.y + self.z * vec.z
+        if(isinstance(vec, _NUMBER)):
+            return Vector(self.x * vec, self.y * vec, self.z * vec)
+        if(isinstance(vec, _ARRAY_LIKE)):
+            return Vector(*(self.coordinates * vec))
+        return NotImplemented
+
+    def __rmul__(self, val):
+        if(isinstance(val, _NUMBER)):
+            return Vector(val * self.x, val * self.y, val * self.z)
+        return NotImplemented
 
     def __pow__(self, vec):
         if(isinstance(vec, Vector)):
-            return Vector(*(np.cross(self.coordinates, vec.coordinates)))
-        return Vector(*(self.coordinates ** vec))
+            return Vector(self.y * vec.z - self.z * vec.y,
+                          self.z * vec.x - self.x * vec.z,
+                          self.x * vec.y - self.y * vec.x)
+        if(isinstance(vec, _NUMBER)):
+            return Vector(self.x ** vec, self.y ** vec, self.z ** vec)
+        if(isinstance(vec, _ARRAY_LIKE)):
+            return Vector(*(self.coordinates ** vec))
+        return NotImplemented
 
     def __truediv__(self, val):
+        if(isinstance(val, _NUMBER)):
+            return Vector(self.x / val, self.y / val, self.z / val)
         return Vector(*(self.coordinates / val))
 
     def __floordiv__(self, val):
+        if(isinstance(val, _NUMBER)):
+            return Vector(self.x // val, self.y // val, self.z // val)
         return Vector(*(self.coordinates // val))
 
+    def __neg__(self):
+        return Vector(-self.x, -self.y, -self.z)
+
     def __eq__(self, vec):
         return (self.x == vec.x) and (self.y == vec.y) and (self.z == vec.z)
 
@@ -48,12 +97,12 @@ class Vector:
         return (self.x != vec.x) or (self.y != vec.y) or (self.z != vec.z)
 
     def __iter__(self):
-        for x in self.coordinates:
-            yield x
+        yield self.x
+        yield self.y
+        yield self.z
 
     def __getitem__(self, item):
-        print("iam called, {}".format(item))
-        return self.coordinates[item]
+        return (self.x, self.y, self.z)[item]
 
     def mag(self):
-        return np.linalg.norm([self.x, self.y, self.z])
\ No newline at end of file
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
@@ -0,0 +1,129 @@
+import numpy as np
+from .vector import Vector
+
+
+# N vectors held in a single (N, 3) buffer, the operators follow the
+# Vector semantics (* is the dot product, ** the cross product) but
+# are applied to the whole batch at once and broadcast against a
+# single Vector
+class VectorArray:
+
+    # keeps ndarray operators from claiming mixed expressions so the
+    # reflected methods below get called instead
+    __array_ufunc__ = None
+
+    def __init__(self, data, copy=True):
+        if isinstance(data, VectorArray):
+            data = data.data
+        elif not isinstance(data, np.ndarray) and len(data) != 0 and isinstance(data[0], Vector):
+            data = [(vec.x, vec.y, vec.z) for vec in data]
+
+        data = np.array(data, dtype=float) if copy else np.asarray(data)
+
+        if data.ndim != 2 or data.shape[1] not in (2, 3):
+            raise TypeError(
+                "Expected an array of shape (N, 3), got {}".format(data.shape))
+
+        if data.shape[1] == 2:
+            data = np.concatenate((data, np.zeros((len(data), 1))), axis=1)
+
+        self.data = data
+
+    @classmethod
+    def zeros(cls, n):
+        return cls(np.zeros((n, 3)), copy=False)
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @property
+    def z(self):
+        return self.data[:, 2]
+
+    def __str__(self):
+        return "VectorArray {}".format(len(self))
+
+    def __repr__(self):
+        return "VectorArray {}".format(len(self))
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __iter__(self):
+        for row in self.data:
+            yield Vector(*row)
+
+    # a single index gives back a Vector, slices and masks a VectorArray
+    # that views the same buffer
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return Vector(*self.data[item])
+        return VectorArray(self.data[item], copy=False)
+
+    def __setitem__(self, item, vec):
+        self.data[item] = self._operand(vec)
+
+    # brings the other operand into a shape that broadcasts against
+    # the (N, 3) buffer
+    def _operand(self, val):
+        if isinstance(val, VectorArray):
+            if(len(self) != len(val)):
+                raise TypeError(
+                    "Dimensions of the arguments are different {}, {}".format(len(self), len(val)))
+            return val.data
+        if isinstance(val, Vector):
+            return np.array([val.x, val.y, val.z])
+        if isinstance(val, np.ndarray) and val.ndim == 1 and val.shape[0] == len(self):
+            return val[:, np.newaxis]
+        return val
+
+    def __add__(self, vec):
+        return VectorArray(self.data + self._operand(vec), copy=False)
+
+    def __radd__(self, vec):
+        return self.__add__(vec)
+
+    def __sub__(self, vec):
+        return VectorArray(self.data - self._operand(vec), copy=False)
+
+    def __rsub__(self, vec):
+        return VectorArray(self._operand(vec) - self.data, copy=False)
+
+    # dot product with vectors, scaling with scalars or an (N,) array
+    def __mul__(self, vec):
+        if isinstance(vec, Vector):
+            return self.data @ self._operand(vec)
+        if isinstance(vec, VectorArray):
+            return np.einsum("ij,ij->i", self.data, self._operand(vec))
+        return VectorArray(self.data * self._operand(vec), copy=False)
+
+    def __rmul__(self, vec):
+        return self.__mul__(vec)
+
+    # cross product with vectors, element wise power otherwise
+    def __pow__(self, vec):
+        if isinstance(vec, (VectorArray, Vector)):
+            return VectorArray(np.cross(self.data, self._operand(vec)), copy=False)
+        return VectorArray(self.data ** self._operand(vec), copy=False)
+
+    def __rpow__(self, vec):
+        if isinstance(vec, Vector):
+            return VectorArray(np.cross(self._operand(vec), self.data), copy=False)
+        return NotImplemented
+
+    def __truediv__(self, val):
+        return VectorArray(self.data / self._operand(val), copy=False)
+
+    def __floordiv__(self, val):
+        return VectorArray(self.data // self._operand(val), copy=False)
+
+    def __neg__(self):
+        return VectorArray(-self.data, copy=False)
+
+    def mag(self):
+        return np.sqrt(np.einsum("ij,ij->i", self.data, self.data))
@@ -1,315 +1,561 @@
 import numpy as np
 from .vector import Vector
-import matplotlib.pyplot as plt
+from .fieldLoader import evaluateVector, meshAxes
+from .slabs import defaultSlab, slabApply, workerSlab
+from .differential import AXES, checkMethod, gradientInto
+from . import spectral
+from .spectral import axisSpacings
+from .derivativeCache import DerivativeCache
+from .lazyField import LazyField
+from .poisson import periodicDecomposition
+from . import sampler
+from .sampler import gridCoordinates
+from .streamlines import integrate
+from . import integrals
+from . import fieldIO
+from .profiling import instrument, phase
+from .precision import DTYPES, checkDtype, floatType
+from . import rendering
+
+
+# converts a legacy object array of Vector instances (or an already
+# numeric array with a trailing component axis of size 2 or 3) into
+# the struct-of-arrays layout used by VectorField, a float array of
+# shape (*grid, 3) holding the x, y, z components
+def toComponentArray(field):
+    field = np.asarray(field)
+
+    if field.dtype != object:
+        if field.ndim == 0 or field.shape[-1] not in (2, 3):
+            raise TypeError(
+                "Expected a trailing component axis of size 2 or 3, got shape {}".format(field.shape))
+        if field.shape[-1] == 2:
+            pad = np.zeros(field.shape[:-1] + (1,), dtype=field.dtype)
+            field = np.concatenate((field, pad), axis=-1)
+        return field
+
+    data = np.empty(field.shape + (3,))
+    with phase("unpack"):
+        for loc, vec in np.ndenumerate(field):
+            data[loc] = (vec.x, vec.y, vec.z)
+
+    return data
+
+
+# converts the (*grid, 3) component layout back into the legacy
+# object array of Vector instances
+def toObjectArray(data):
+    field = np.empty(data.shape[:-1], dtype=object)
+    with phase("pack"):
+        for loc in np.ndindex(field.shape):
+            field[loc] = Vector(*data[loc])
+
+    return field
+
+
+# (component, direction) pairs added and subtracted for each curl component
+CURL_TERMS = (
+    ((2, 1), (1, 2)),
+    ((0, 2), (2, 0)),
+    ((1, 0), (0, 1)),
+)
+
 
 class VectorField:
     # dx, dy, dz defines the spacing between the co-ordinates
-    def __init__(self, field, origin=[0, 0, 0], dist=[1, 1, 1]):
-        self.field = np.array(field)
+    # field is either a legacy array of Vector objects or a numeric
+    # array whose last axis holds the (x, y, z) components, memory
+    # mapped arrays are never copied
+    # components are float32 or float64: dtype converts them, by default
+    # integer and boolean values become float64, see precision; every
+    # operator keeps that precision
+    def __init__(self, field, origin=[0, 0, 0], dist=[1, 1, 1], copy=True, dtype=None):
+        self.derivatives = DerivativeCache()
+        if dtype is not None:
+            dtype = checkDtype(dtype)
+
+        if (isinstance(field, np.memmap) and field.ndim > 0 and field.shape[-1] == 3
+                and field.dtype in DTYPES and (dtype is None or dtype == field.dtype)):
+            self.data = field
+        else:
+            data = toComponentArray(field)
+            dtype = checkDtype(floatType(data) if dtype is None else dtype)
+            if copy:
+                self.data = np.array(data, dtype=dtype)
+            else:
+                self.data = np.asarray(data, dtype=dtype)
         self.origin = origin
         self.dist = dist
 
+    # opens a raw (*shape, 3) component array on disk without reading it
+    # into memory, shape is the grid shape
+    @classmethod
+    def fromMemmap(cls, filename, shape, dtype=np.float64, mode="r", offset=0, origin=[0, 0, 0], dist=[1, 1, 1]):
+        field = np.memmap(filename, dtype=dtype, mode=mode,
+                          offset=offset, shape=tuple(shape) + (3,))
+        return cls(field, origin=origin, dist=dist)
+
+    # builds a field directly from the component arrays, z defaults
+    # to zeros for planar fields
+    @classmethod
+    def fromComponents(cls, x, y, z=None, origin=[0, 0, 0], dist=[1, 1, 1], dtype=None):
+        x = np.asarray(x)
+        if dtype is None:
+            dtype = floatType(x, y) if z is None else floatType(x, y, z)
+        data = np.empty(x.shape + (3,), dtype=checkDtype(dtype))
+        data[..., 0] = x
+        data[..., 1] = y
+        data[..., 2] = 0 if z is None else z
+
+        return cls(data, origin=origin, dist=dist, copy=False)
+
+    # writes the (*grid, 3) component array with origin and dist, see
+    # fieldIO for the formats; compression="zlib" compresses it chunk by
+    # chunk
+    def save(self, filename, compression=None, level=6, chunk=None):
+        fieldIO.save(filename, "vector", self.data, self.origin, self.dist,
+                     compression=compression, level=level, chunk=chunk)
+
+    # mmap=True maps an uncompressed raw file instead of reading it
+    @classmethod
+    def load(cls, filename, mmap=False, mode="r"):
+        kind, data, origin, dist = fieldIO.load(filename, mmap=mmap, mode=mode)
+        fieldIO.checkKind(kind, "vector")
+        return cls(data, origin=origin, dist=dist, copy=False)
+
+    # replacing the data drops every cached derivative, call invalidate
+    # after writing into data in place; new values follow the dtype
+    # policy of the constructor, float32 and float64 arrays are kept as
+    # they are
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        data = data if isinstance(data, np.ndarray) else np.asarray(data)
+        self._data = data.astype(checkDtype(floatType(data)), copy=False)
+        self.invalidate()
+
+    def invalidate(self):
+        self.derivatives.clear()
+        self._objects = None
+
+    @property
+    def shape(self):
+        return self.data.shape[:-1]
+
+    @property
+    def ndim(self):
+        return self.data.ndim - 1
+
+    # views into data, no copies are made
+    @property
+    def components(self):
+        return self.data[..., 0], self.data[..., 1], self.data[..., 2]
+
+    # a new object array of Vector instances holding a copy of the data
+    def toObjectArray(self):
+        return toObjectArray(self.data)
+
+    # legacy object array of the field, built on the first access and
+    # kept until the data is replaced or invalidated; it is read only,
+    # assign to field or write into data to change the field
+    @property
+    def field(self):
+        if self._objects is None:
+            self._objects = toObjectArray(self.data)
+            self._objects.flags.writeable = False
+        return self._objects
+
+    @field.setter
+    def field(self, field):
+        data = toComponentArray(field)
+        self.data = np.array(data, dtype=checkDtype(floatType(data)))
+
     def __repr__(self):
-        return "Vector Field {}".format(self.field.shape)
+        return "Vector Field {}".format(self.shape)
 
     def __str__(self):
-        return "Vector Field {}".format(self.field.shape)
+        return "Vector Field {}".format(self.shape)
+
+    # brings the other operand into a shape that broadcasts against
+    # the (*grid, 3) component array
+    def _operand(self, val):
+        from .scalarField import ScalarField
 
-    def __add__(self, val):
         if isinstance(val, VectorField):
-            if(self.field.shape != val.field.shape):
+            if(self.shape != val.shape):
                 raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return VectorField(self.field + val.field)
-        return VectorField(self.field + val)
+                    "Dimensions of the arguments are different {}, {}".format(self.shape, val.shape))
+            return val.data
+        if isinstance(val, Vector):
+            return np.array([val.x, val.y, val.z], dtype=floatType(self.data))
+        if isinstance(val, ScalarField):
+            if(self.shape != val.field.shape):
+                raise TypeError(
+                    "Dimensions of the arguments are different {}, {}".format(self.shape, val.field.shape))
+            val = val.field
+        if isinstance(val, np.ndarray) and val.ndim > 0 and val.shape == self.shape:
+            return val[..., np.newaxis]
+        return val
+
+    def _defers(self, val):
+        return isinstance(val, LazyField)
+
+    # results live on the same grid and in the precision of self
+    def _result(self, data):
+        return VectorField(data, origin=self.origin, dist=self.dist, copy=False, dtype=self.data.dtype)
+
+    # updates data in place when the result type fits, otherwise the
+    # data is replaced as the plain operator would
+    @instrument("VectorField.inplace")
+    def _inplace(self, op, val):
+        if self._defers(val):
+            return NotImplemented
+
+        val = self._operand(val)
+        try:
+            op(self.data, val, out=self.data)
+            self.invalidate()
+        except TypeError:
+            # numpy refuses to cast the result back, e.g. for complex
+            # values, which the data setter rejects
+            self.data = op(self.data, val)
+        return self
+
+    @instrument("VectorField.add")
+    def __add__(self, val):
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.data + self._operand(val))
 
+    @instrument("VectorField.sub")
     def __sub__(self, val):
-        if isinstance(val, VectorField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return VectorField(self.field - val.field)
-        return VectorField(self.field - val)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.data - self._operand(val))
 
+    # multiplying two vector fields (or a field and a Vector) gives the
+    # dot product at each point, anything else scales the components
+    @instrument("VectorField.mul")
     def __mul__(self, val):
-        if isinstance(val, VectorField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return VectorField(self.field * val.field)
-        return VectorField(self.field * val)
-
+        from .scalarField import ScalarField
+
+        if self._defers(val):
+            return NotImplemented
+        if isinstance(val, (VectorField, Vector)):
+            other = self._operand(val)
+            return ScalarField(np.einsum("...i,...i->...", self.data, np.broadcast_to(other, self.data.shape)),
+                               origin=self.origin, dist=self.dist, copy=False, dtype=self.data.dtype)
+        return self._result(self.data * self._operand(val))
+
+    # scalars and scalar fields scale the components from either side
+    @instrument("VectorField.rmul")
+    def __rmul__(self, val):
+        if isinstance(val, Vector):
+            return self.__mul__(val)
+        return self._result(self._operand(val) * self.data)
+
+    # ** between vectors is the cross product as in Vector
+    @instrument("VectorField.pow")
     def __pow__(self, val):
-        if isinstance(val, VectorField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return VectorField(self.field ** val.field)
-        return VectorField(self.field ** val)
+        if self._defers(val):
+            return NotImplemented
+        if isinstance(val, (VectorField, Vector)):
+            return self._result(np.cross(self.data, self._operand(val)))
+        return self._result(self.data ** self._operand(val))
 
+    @instrument("VectorField.truediv")
     def __truediv__(self, val):
-        if isinstance(val, VectorField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return VectorField(self.field / val.field)
-        return VectorField(self.field / val)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.data / self._operand(val))
 
+    @instrument("VectorField.floordiv")
     def __floordiv__(self, val):
-        if isinstance(val, VectorField):
-            if(self.field.shape != val.field.shape):
-                raise TypeError(
-                    "Dimensions of the arguments are different {}, {}".format(self.field.shape, val.field.shape))
-            return VectorField(self.field // val.field)
-        return VectorField(self.field // val)
-
-    def divergence(self):
-        x_comp = []
-        y_comp = []
-        z_comp = []
-
-        for loc, vec in np.ndenumerate(self.field):
-            x_comp.append(vec.x)
-            y_comp.append(vec.y)
-            z_comp.append(vec.z)
-
-        x_comp = np.array(x_comp).reshape(self.field.shape)
-        y_comp = np.array(y_comp).reshape(self.field.shape)
-        z_comp = np.array(z_comp).reshape(self.field.shape)
-
-        _dz = np.gradient(x_comp, self.dist[2], axis=0) + np.gradient(z_comp,
-                                                                      self.dist[2], axis=0) + np.gradient(y_comp, self.dist[2], axis=0)
-        _dx = np.gradient(x_comp, self.dist[0], axis=1) + np.gradient(z_comp, self.dist[0],
-                                                                      axis=1) + np.gradient(y_comp, self.dist[0], axis=1)
-        _dy = np.gradient(x_comp, self.dist[1], axis=2) + np.gradient(z_comp, self.dist[1],
-                                                                      axis=2) + np.gradient(y_comp, self.dist[1], axis=2)
-
-        return (_dx + _dy + _dz)
-
-    def curl(self):
-        if(self.field.ndim == 2):
-            x_comp = []
-            y_comp = []
-
-            for loc, vec in np.ndenumerate(self.field):
-                x_comp.append(vec.x)
-                y_comp.append(vec.y)
-
-            x_comp = np.array(x_comp).reshape(self.field.shape)
-            y_comp = np.array(y_comp).reshape(self.field.shape)
-
-            x_comp_y = np.gradient(x_comp, self.dist[0], axis=1)
-            y_comp_x = np.gradient(y_comp, self.dist[2], axis=0)
-
-            curl_z = y_comp_x - x_comp_y
-
-            temp = []
-
-            for loc, curl in np.ndenumerate(curl_z):
-                temp.append(Vector(0, 0, curl))
-
-            temp = np.array(temp)
-            temp.resize(self.field.shape)
-
-            return VectorField(temp)
-
-        elif self.field.ndim == 3:
-
-            x_comp = []
-            y_comp = []
-            z_comp = []
-
-            for loc, vec in np.ndenumerate(self.field):
-                x_comp.append(vec.x)
-                y_comp.append(vec.y)
-                z_comp.append(vec.z)
-
-            x_comp = np.array(x_comp).reshape(self.field.shape)
-            y_comp = np.array(y_comp).reshape(self.field.shape)
-            z_comp = np.array(z_comp).reshape(self.field.shape)
-
-            x_comp_y = np.gradient(x_comp, self.dist[1], axis=2)
-            x_comp_z = np.gradient(x_comp, self.dist[2], axis=0)
-
-            y_comp_x = np.gradient(y_comp, self.dist[0], axis=1)
-            y_comp_z = np.gradient(y_comp, self.dist[2], axis=0)
-
-            z_comp_x = np.gradient(z_comp, self.dist[0], axis=1)
-            z_comp_y = np.gradient(z_comp, self.dist[1], axis=2)
-
-            curl_x = z_comp_y - y_comp_z
-            curl_y = x_comp_z - z_comp_x
-            curl_z = y_comp_x - x_comp_y
-
-            temp = []
-
-            for loc, curl in np.ndenumerate(curl_x):
-                if len(loc) == 1:
-                    temp.append(Vector(curl, curl_y[loc[0]], curl_z[loc[0]]))
-                elif len(loc) == 2:
-                    temp.append(
-                        Vector(curl, curl_y[loc[0]][loc[1]], curl_z[loc[0]][loc[1]]))
-                elif len(loc) == 3:
-                    temp.append(
-                        Vector(curl, curl_y[loc[0]][loc[1]][loc[2]], curl_z[loc[0]][loc[1]][loc[2]]))
-
-            temp = np.array(temp)
-            temp.resize(self.field.shape)
+        if self._defers(val):
+            return NotImplemented
+        return self._result(self.data // self._operand(val))
+
+    def __iadd__(self, val):
+        return self._inplace(np.add, val)
+
+    def __isub__(self, val):
+        return self._inplace(np.subtract, val)
+
+    # the dot product changes the field type so it can't be in place
+    def __imul__(self, val):
+        if isinstance(val, (VectorField, Vector)):
+            return self.__mul__(val)
+        return self._inplace(np.multiply, val)
+
+    def __ipow__(self, val):
+        if isinstance(val, (VectorField, Vector)):
+            self.data[...] = np.cross(self.data, self._operand(val))
+            self.invalidate()
+            return self
+        return self._inplace(np.power, val)
+
+    def __itruediv__(self, val):
+        return self._inplace(np.true_divide, val)
+
+    def __ifloordiv__(self, val):
+        return self._inplace(np.floor_divide, val)
+
+    # records arithmetic into an expression that is evaluated in fused
+    # chunks, see lazyField
+    def lazy(self):
+        return LazyField.leaf(self)
+
+    # runs op over the whole component array, or slab by slab for memory
+    # mapped fields or when slab is given; the halo matches the width the
+    # edge stencil of the given order needs, spectral derivatives are
+    # global so they always run on the whole field; workers > 1 splits the
+    # grid into that many slabs run on a thread pool, with the same result
+    # as the serial path
+    def _apply(self, op, out, shape, slab, order=1, method="fd", workers=1):
+        checkMethod(method)
+
+        if method == "spectral" and slab is not None:
+            raise ValueError(
+                "Spectral derivatives need the whole field, they can't be computed slab by slab")
+
+        if slab is None and method == "fd" and isinstance(self.data, np.memmap):
+            slab = defaultSlab(self.data.shape, self.data.itemsize)
+
+        if slab is None and method == "fd" and workers > 1:
+            slab = workerSlab(self.data.shape[0], workers)
+
+        if slab is None and out is None:
+            return op(self.data, None)
+
+        if out is None:
+            out = np.empty(shape, dtype=floatType(self.data))
+
+        if(out.shape != shape):
+            raise TypeError(
+                "Dimensions of the output buffer are different {}, {}".format(out.shape, shape))
+
+        # a caller supplied buffer is filled directly, skipping the cache
+        if slab is None:
+            return op(self.data, out)
+
+        return slabApply(lambda block: op(block, None), self.data, out, slab, halo=order, workers=workers)
+
+    # derivative of component comp (0, 1, 2 for x, y, z) along the
+    # direction along, None when the field has no such axis; method is
+    # "fd" for np.gradient style differences with edges of the given
+    # order or "spectral" for periodic fields
+    def partial(self, comp, along, order=1, method="fd"):
+        checkMethod(method)
+        return self._partial(self.data, comp, along, order, method)
+
+    # only derivatives of the field's own data go through the cache,
+    # slabs of a memory mapped field are computed and dropped; a given
+    # out is written into instead and skips the cache too
+    def _partial(self, data, comp, along, order=1, method="fd", out=None):
+        axis = AXES[data.ndim - 1][along]
+        if axis is None:
+            return None
+
+        spacing = self.dist[along]
+        cached = data is self._data and out is None
+
+        if method == "spectral":
+            spacings = axisSpacings(data.ndim - 1, self.dist)
+
+            def compute():
+                with phase("differentiate"):
+                    result = spectral.derivative(data[..., comp], spacings, axis, self._spectrum(data, comp, cached))
+                if out is None:
+                    return result
+                out[...] = result
+                return out
+
+            order = "spectral"
+        else:
+            def compute():
+                with phase("differentiate"):
+                    return gradientInto(data[..., comp], spacing, axis, out, order=order)
+
+        if not cached:
+            return compute()
+
+        return self.derivatives.get((comp, axis, spacing, order), compute)
+
+    # the rfftn of one component, shared by all its spectral derivatives
+    def _spectrum(self, data, comp, cached=True):
+        if not cached:
+            return spectral.spectrum(data[..., comp])
+        return self.derivatives.get((comp, None, None, "rfftn"), lambda: spectral.spectrum(data[..., comp]))
+
+    @instrument("VectorField.divergence")
+    def divergence(self, out=None, slab=None, order=1, method="fd", workers=1):
+        return self._apply(lambda data, out: self._divergence(data, order, method, out), out, self.shape, slab,
+                           order, method, workers)
+
+    # dFx/dx + dFy/dy + dFz/dz, without out the partials come from the
+    # cache, with it they go through one scratch component and are added
+    # into out
+    def _divergence(self, data, order=1, method="fd", out=None):
+        scratch = None
+        if out is None:
+            out = np.zeros(data.shape[:-1], dtype=floatType(data))
+        else:
+            out[...] = 0
+            scratch = np.empty(out.shape, dtype=out.dtype)
+
+        for comp in range(3):
+            partial = self._partial(data, comp, comp, order, method, scratch)
+            if partial is not None:
+                out += partial
+
+        return out
+
+    @instrument("VectorField.curl")
+    def curl(self, out=None, slab=None, order=1, method="fd", workers=1):
+        if isinstance(out, VectorField):
+            out = out.data
+
+        out = self._apply(lambda data, out: self._curl(data, order, method, out), out, self.shape + (3,), slab,
+                          order, method, workers)
+        return VectorField(out, origin=self.origin, dist=self.dist, copy=False)
+
+    # (dFz/dy - dFy/dz, dFx/dz - dFz/dx, dFy/dx - dFx/dy), terms along an
+    # axis the field doesn't have are zero
+    def _curl(self, data, order=1, method="fd", out=None):
+        scratch = None
+        if out is None:
+            out = np.zeros(data.shape, dtype=floatType(data))
+        else:
+            out[...] = 0
+            scratch = np.empty(data.shape[:-1], dtype=out.dtype)
+
+        for comp, (plus, minus) in enumerate(CURL_TERMS):
+            partial = self._partial(data, *plus, order, method, scratch)
+            if partial is not None:
+                out[..., comp] += partial
+
+            partial = self._partial(data, *minus, order, method, scratch)
+            if partial is not None:
+                out[..., comp] -= partial
+
+        return out
+
+    # J[..., i, j] = dF_i / dx_j as a (*shape, 3, 3) array
+    @instrument("VectorField.jacobian")
+    def jacobian(self, out=None, slab=None, order=1, method="fd", workers=1):
+        return self._apply(lambda data, out: self._jacobian(data, order, method, out), out, self.shape + (3, 3),
+                           slab, order, method, workers)
+
+    # with out every partial is written straight into its entry
+    def _jacobian(self, data, order=1, method="fd", out=None):
+        cached = out is None
+        if out is None:
+            out = np.empty(data.shape + (3,), dtype=floatType(data))
+
+        for comp in range(3):
+            for along in range(3):
+                entry = out[..., comp, along]
+                partial = self._partial(data, comp, along, order, method, None if cached else entry)
+                if partial is None:
+                    entry[...] = 0
+                elif cached:
+                    entry[...] = partial
+
+        return out
+
+    # interpolated (M, 3) vectors at an (M, 3) array of world space points
+    def sample(self, points, mode="trilinear"):
+        coords = gridCoordinates(points, self.ndim, self.origin, self.dist)
+        return sampler.sample(self.data, coords, mode)
+
+    # (3,) integral of the components over the whole grid, rule is
+    # "trapezoid" or "simpson"
+    def integrate(self, rule="trapezoid"):
+        return integrals.volumeIntegral(self.data, self.ndim, self.dist, rule)
+
+    # circulation along (K, 3) polylines or a (B, K, 3) batch of them
+    def lineIntegral(self, polylines, samples=1, mode="trilinear"):
+        return integrals.lineIntegral(self, polylines, samples, mode)
+
+    # flux through the grid plane at index along x, y or z (0, 1, 2)
+    def planeFlux(self, along, index, rule="trapezoid"):
+        return integrals.planeFlux(self.data, self.ndim, self.dist, along, index, rule)
+
+    # flux through a triangle mesh of (V, 3) vertices and (F, 3) faces
+    def surfaceFlux(self, vertices, faces, mode="trilinear"):
+        return integrals.surfaceFlux(self, vertices, faces, mode)
+
+    # traces the seeds ((M, 3) world points) through the field, returns
+    # (paths, counts), see streamlines.integrate for the options; step
+    # defaults to half the smallest grid spacing
+    def streamlines(self, seeds, step=None, steps=100, method="rk4", **options):
+        if step is None:
+            step = 0.5 * min(self.dist[along] for along, axis in enumerate(AXES[self.ndim])
+                             if axis is not None)
+        return integrate(self, seeds, step, steps, method, **options)
+
+    # splits the field into (curl free, divergence free) VectorFields,
+    # periodic fields are projected exactly in fourier space, otherwise
+    # the curl free part is the gradient of the dirichlet poisson
+    # solution for the divergence
+    def helmholtzDecomposition(self, boundary="periodic"):
+        from .scalarField import ScalarField
+
+        if boundary == "periodic":
+            curlFree, divFree = periodicDecomposition(self.data, self.dist)
+        else:
+            phi = ScalarField(self.divergence(), origin=self.origin, dist=self.dist,
+                              copy=False).solvePoisson(boundary=boundary)
+            curlFree = phi.gradient().data
+            divFree = self.data - curlFree
 
-            return VectorField(temp)
+        return self._result(curlFree), self._result(divFree)
 
     # scale is used for arrows length
 
-    def show(self, x=(), y=(), z=(), scale=0.2, title="Vector Field"):
-        if(self.field.ndim == 1):
-            x_axis = []
-            c_x = []
-            c_y = []
-            c_z = []
-
-            if len(x) != 0:
-                x_axis = np.linspace(x[0], x[1], self.field.shape[0])
-
-            for loc, vec in np.ndenumerate(self.field):
-                if len(x) == 0:
-                    x_axis.append(loc[0])
-                c_x.append(vec.x)
-                c_y.append(vec.y)
-                c_z.append(vec.z)
-
-            x_axis = np.array([x*self.dist[0] + self.origin[0]
-                               for x in x_axis])
-            y_axis = np.array([0 for x in range(0, len(x_axis))])
-            z_axis = np.array([0 for x in range(0, len(x_axis))])
-
-            fig = plt.figure()
-            ax = fig.add_subplot(111, projection="3d")
-            ax.quiver(x_axis, y_axis, z_axis, c_x, c_y,
-                      c_z, length=1 * scale, normalize=True)
-
-            ax.set_xlabel("x axis")
-            ax.set_ylabel("y axis")
-            ax.set_zlabel("z axis")
-            
-            plt.title(title)
-            plt.show()
-        
-        elif(self.field.ndim == 2):
-            x_axis = []
-            y_axis = []
-
-            c_x = []
-            c_y = []
-            c_z = []
-
-            if len(x) != 0 and len(y) != 0:
-                x_axis, y_axis = np.meshgrid(
-                    np.linspace(x[0], x[1], self.field.shape[0]),
-                    np.linspace(y[0], y[1], self.field.shape[1])
-                )
-
-            for loc, vec in np.ndenumerate(self.field):
-
-                if len(x) == 0 or len(y) == 0:
-                    x_axis.append(loc[0])
-                    y_axis.append(loc[1])
-
-                c_x.append(vec.x)
-                c_y.append(vec.y)
-                c_z.append(vec.z)
-
-            x_axis = np.array([x*self.dist[0] + self.origin[0]
-                               for x in x_axis])
-            y_axis = np.array([y*self.dist[1] + self.origin[1]
-                               for y in y_axis])
-            z_axis = np.array([0 for x in range(0, x_axis.size)])
-
-            x_axis = np.array(x_axis)
-            y_axis = np.array(y_axis)
-            z_axis = np.array(z_axis)
-
-            c_x = np.array(c_x).reshape(self.field.shape)
-            c_y = np.array(c_y).reshape(self.field.shape)
-            c_z = np.array(c_z).reshape(self.field.shape)
-
-            fig = plt.figure()
-            ax = fig.add_subplot(111, projection="3d")
-            ax.quiver(x_axis, y_axis, z_axis, c_x, c_y,
-                      c_z, length=1 * scale, normalize=True)
-
-            ax.set_xlabel("x axis")
-            ax.set_ylabel("y axis")
-            ax.set_zlabel("z axis")
-            
-            plt.title(title)
-            plt.show()
-
-        elif(self.field.ndim == 3):
-            x_axis = []
-            y_axis = []
-            z_axis = []
-
-            c_x = []
-            c_y = []
-            c_z = []
-
-            if len(x) != 0 and len(y) != 0 and len(z) != 0:
-                z_axis, x_axis, y_axis = np.meshgrid(
-                    np.linspace(z[0], z[1], self.field.shape[0]),
-                    np.linspace(x[0], x[1], self.field.shape[1]),
-                    np.linspace(y[0], y[1], self.field.shape[2])
-                )
-
-            for loc, vec in np.ndenumerate(self.field):
-                if len(x) == 0 or len(y) == 0:
-                    x_axis.append(loc[0])
-                    y_axis.append(loc[1])
-                    z_axis.append(loc[2])
-                c_x.append(vec.x)
-                c_y.append(vec.y)
-                c_z.append(vec.z)
-
-            x_axis = np.array([x*self.dist[0] + self.origin[0]
-                               for x in x_axis])
-            y_axis = np.array([y*self.dist[1] + self.origin[1]
-                               for y in y_axis])
-            z_axis = np.array([z*self.dist[2] + self.origin[2]
-                               for z in z_axis])
-
-            fig = plt.figure()
-            ax = fig.add_subplot(111, projection="3d")
-            ax.quiver(x_axis, y_axis, z_axis, c_x, c_y,
-                      c_z, length=1 * scale, normalize=True)
-
-            ax.set_xlabel("x axis")
-            ax.set_ylabel("y axis")
-            ax.set_zlabel("z axis")
-
-            plt.title(title)
-            plt.show()
+    # streamlines takes an (M, 3) array of seeds and draws the traced
+    # lines instead of the arrows; the other options are the ones of
+    # ScalarField.show, the isosurface view uses the magnitude
+    @instrument("VectorField.show")
+    def show(self, x=(), y=(), z=(), scale=0.2, title="Vector Field", streamlines=None, steps=100,
+             view="points", along=2, index=None, level=None, budget=rendering.DEFAULT_BUDGET,
+             lod="stride", filename=None, dpi=100):
+        if streamlines is not None:
+            paths, _ = self.streamlines(streamlines, steps=steps)
+            with phase("render"):
+                return rendering.renderPaths(paths, title=title, filename=filename, dpi=dpi)
+
+        with phase("render"):
+            return rendering.renderVector(self.data, self.origin, self.dist, view=view, scale=scale,
+                                          ranges=(x, y, z), along=along, index=index, level=level,
+                                          budget=budget, lod=lod, title=title, filename=filename, dpi=dpi)
 
     # here origin defines where all the user axes starts
     # fun takes in the location and gives the resultant
     # vector at that point
     # x, y, z represents the axes generated using meshgrid
+    # mode="vectorized" passes the whole meshgrid arrays to fun in one
+    # call, see fieldLoader for what fun has to return in each mode
+    # mode="parallel" calls fun per point on a pool of the given number
+    # of workers, chunksize is in grid points; the default process pool
+    # is what speeds up pure python fun, which holds the GIL, a fun that
+    # can't be pickled (lambdas, closures) runs on threads instead, see
+    # fieldLoader.evaluateParallel
     @classmethod
-    def loadField(cls, origin, fun, x, y, z=[], dist=[1, 1, 1]):
-        field = []
-
-        if len(z) == 0:
-            for loc, _x in np.ndenumerate(np.array(x)):
-                _y = y[loc[0]][loc[1]]
-                field.append(fun((_x, _y)))
-        else:
-            for loc, _x in np.ndenumerate(np.array(x)):
-                _y = y[loc[0]][loc[1]][loc[2]]
-                _z = y[loc[0]][loc[1]][loc[2]]
-                field.append(
-                    fun((_x, _y, _z)))
+    @instrument("VectorField.loadField")
+    def loadField(cls, origin, fun, x, y, z=[], dist=[1, 1, 1], mode="pointwise",
+                  workers=None, chunksize=None, executor="process", dtype=None):
+        if dtype is not None:
+            dtype = checkDtype(dtype)
 
-        field = np.array(field).reshape(np.array(x).shape)
+        with phase("evaluate"):
+            field = evaluateVector(fun, meshAxes(x, y, z), mode, dtype=dtype, workers=workers,
+                                   chunksize=chunksize, executor=executor)
 
         if(len(origin) == 2):
             origin.append(0)
 
-        return VectorField(field, origin=origin, dist=dist)
+        return VectorField(field, origin=origin, dist=dist, copy=False)